@@ -0,0 +1,149 @@
+"""
+Batch Extraction Module
+
+Re-runs the scraping_utils extractors (contacts, opening hours, services,
+impressum) over a saved raw_html_text corpus on all CPU cores.
+
+Pages are read lazily from the results files, grouped into chunks and handed
+to a process pool. Results are written to one CSV table in the order of the
+input, independent of which worker finishes first, and only a bounded number
+of chunks is in flight, so memory stays constant for any corpus size.
+
+Usage:
+    python batch_extract.py raw_html_text --output raw_html_text/extracted.csv
+
+Author: DSSG Berlin Volunteers
+"""
+
+import argparse
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from jsonl_store import iter_records
+from parsed_page import ParsedPage
+from scraping_utils import extract_all
+
+RESULT_COLUMNS = [
+    'source', 'url', 'emails', 'phones', 'social_media', 'opening_hours', 'services',
+    'legal_form', 'registration', 'impressum_link', 'error',
+]
+RESULT_GLOBS = ('results_html_text_*.jsonl*', 'results_html_text_*.json')
+
+
+def find_result_files(inputs: Iterable[Path]) -> List[Path]:
+    """Expand directories to the crawl results files they contain (oldest first)."""
+    files = []
+    for path in map(Path, inputs):
+        if path.is_dir():
+            found = {f for pattern in RESULT_GLOBS for f in path.glob(pattern)}
+            files.extend(sorted(found))
+        else:
+            files.append(path)
+    return files
+
+
+def iter_pages(files: Iterable[Path]) -> Iterator[Dict]:
+    """Successfully fetched pages of all files, in file and record order."""
+    for path in files:
+        for record in iter_records(path):
+            if record.get('success') and record.get('html_text'):
+                yield {'source': record.get('source'), 'url': record.get('url'), 'html': record['html_text']}
+
+
+def _join(values) -> str:
+    return ' | '.join(dict.fromkeys(v.strip() for v in values if v and v.strip()))
+
+
+def extract_page(page: Dict) -> Dict:
+    """Extract one page into a flat result row."""
+    row = {'source': page['source'], 'url': page['url']}
+    try:
+        data = extract_all(ParsedPage(page['html'], page['url']), page['url'])
+    except Exception as e:  # one broken page must not stop the batch
+        return {**row, 'error': f"{type(e).__name__}: {e}"}
+    contacts, impressum = data['contact_info'], data['impressum']
+    row.update({
+        'emails': _join(contacts['emails']),
+        'phones': _join(contacts['phones']),
+        'social_media': _join(contacts['social_media']),
+        'opening_hours': _join(data['opening_hours']),
+        'services': _join(data['services']),
+        'legal_form': impressum['legal_form'],
+        'registration': impressum['registration'],
+        'impressum_link': data['impressum_link'],
+    })
+    return row
+
+
+def _extract_chunk(chunk: List[Dict]) -> List[Dict]:
+    return [extract_page(page) for page in chunk]
+
+
+def _chunks(pages: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    while True:
+        chunk = list(islice(pages, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def batch_extract(inputs: Iterable[Path], output_file: Path, max_workers: Optional[int] = None,
+                  chunk_size: int = 50) -> int:
+    """
+    Extract all pages of the given results files (or directories) into a CSV table.
+
+    Args:
+        inputs: Crawl results files or directories containing them
+        output_file: CSV file to write (one row per page, in input order)
+        max_workers: Worker processes, defaults to all cores
+        chunk_size: Pages per task sent to a worker
+
+    Returns:
+        Number of extracted pages
+    """
+    files = find_result_files(inputs)
+    if not files:
+        raise FileNotFoundError(f"No crawl results found in {list(map(str, inputs))}")
+    max_workers = max_workers or os.cpu_count() or 1
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    print(f"Extracting {len(files)} file(s) with {max_workers} processes -> {output_file}")
+
+    started = time.monotonic()
+    done = 0
+    chunks = _chunks(iter_pages(files), chunk_size)
+    with open(output_file, 'w', newline='', encoding='utf-8') as f, \
+            ProcessPoolExecutor(max_workers=max_workers) as executor:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        # futures are consumed in submission order, so the output order is the input order
+        in_flight = deque(executor.submit(_extract_chunk, c) for c in islice(chunks, 2 * max_workers))
+        while in_flight:
+            rows = in_flight.popleft().result()
+            next_chunk = next(chunks, None)
+            if next_chunk is not None:
+                in_flight.append(executor.submit(_extract_chunk, next_chunk))
+            writer.writerows(rows)
+            done += len(rows)
+            elapsed = time.monotonic() - started
+            print(f"  {done} pages, {done / max(elapsed, 1e-9):.0f} pages/s", end='\r')
+    print(f"\nExtracted {done} pages in {time.monotonic() - started:.0f}s")
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the HTML extractors over saved crawl results")
+    parser.add_argument("inputs", nargs='+', type=Path,
+                        help="Results files (.json/.jsonl[.gz|.zst]) or directories such as raw_html_text")
+    parser.add_argument("--output", type=Path, default=Path("raw_html_text/extracted.csv"))
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=50, help="Pages per task")
+    args = parser.parse_args()
+
+    batch_extract(args.inputs, args.output, args.workers, args.chunk_size)
@@ -0,0 +1,88 @@
+"""
+Extraction Benchmark
+
+Measures the per-page time of running all scraping_utils extractors on
+crawled pages, the old way (every extractor parses the page again with
+html.parser) against a single ParsedPage shared by all extractors.
+
+Usage:
+    python benchmark_extraction.py raw_html_text/results_html_text_<ts>.jsonl --limit 200
+
+Author: DSSG Berlin Volunteers
+"""
+
+import argparse
+import statistics
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from jsonl_store import iter_records
+from parsed_page import HTML_PARSER, ParsedPage
+from scraping_utils import (extract_all, extract_contact_info, extract_impressum_data,
+                            extract_opening_hours, extract_services, find_impressum_link)
+
+
+def load_pages(path: Path, limit: int) -> List[Dict]:
+    """Pages with HTML from a crawl results file or a directory of .html files."""
+    if path.is_dir():
+        files = islice(sorted(path.glob('*.html')), limit)
+        return [{'url': f'https://{f.stem}/', 'html': f.read_text(encoding='utf-8', errors='replace')}
+                for f in files]
+    records = (r for r in iter_records(path) if r.get('success') and r.get('html_text'))
+    return [{'url': r['url'], 'html': r['html_text']} for r in islice(records, limit)]
+
+
+def extract_separately(html: str, url: str) -> Dict:
+    """Previous behaviour: one html.parser parse and get_text() per extractor."""
+    parse = lambda: ParsedPage(html, url, parser='html.parser')
+    return {
+        'contact_info': extract_contact_info(parse()),
+        'opening_hours': extract_opening_hours(parse()),
+        'services': extract_services(parse()),
+        'impressum': extract_impressum_data(parse()),
+        'impressum_link': find_impressum_link(parse(), url),
+    }
+
+
+def extract_once(html: str, url: str) -> Dict:
+    return extract_all(ParsedPage(html, url), url)
+
+
+def time_pages(pages: List[Dict], extract: Callable[[str, str], Dict], repeat: int) -> List[float]:
+    """Best of repeat runs per page, in milliseconds."""
+    timings = []
+    for page in pages:
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            extract(page['html'], page['url'])
+            best = min(best, time.perf_counter() - started)
+        timings.append(best * 1000)
+    return timings
+
+
+def describe(label: str, timings: List[float]) -> str:
+    return (f"{label:<28} mean {statistics.mean(timings):8.2f} ms  "
+            f"median {statistics.median(timings):8.2f} ms  total {sum(timings) / 1000:7.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-page extraction time")
+    parser.add_argument("source", type=Path, help="Crawl results (.json/.jsonl[.gz|.zst]) or a directory of .html files")
+    parser.add_argument("--limit", type=int, default=200, help="Number of pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per page, the fastest counts")
+    args = parser.parse_args()
+
+    pages = load_pages(args.source, args.limit)
+    if not pages:
+        raise SystemExit(f"No pages with HTML in {args.source}")
+    size = sum(len(p['html']) for p in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size:.0f} KiB on average")
+
+    before = time_pages(pages, extract_separately, args.repeat)
+    after = time_pages(pages, extract_once, args.repeat)
+    print(describe("separate parses (html.parser)", before))
+    print(describe(f"ParsedPage ({HTML_PARSER})", after))
+    print(f"Speedup: {sum(before) / sum(after):.1f}x")
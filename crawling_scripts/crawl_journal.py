@@ -0,0 +1,115 @@
+"""
+Crawl Journal Module
+
+SQLite journal of completed work units (crawled URLs, fetched OSM regions) for
+long running jobs. Each completed unit is committed immediately, so after a
+crash or kill a run can be resumed and skips everything that was already done.
+
+Author: DSSG Berlin Volunteers
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,
+    output      TEXT,
+    started_at  TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS done (
+    run_id  INTEGER NOT NULL REFERENCES runs(id),
+    key     TEXT NOT NULL,
+    payload TEXT,
+    done_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, key)
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class CrawlJournal:
+    """
+    Journal of one run of a given kind (e.g. 'html' or 'osm').
+
+    With ``resume=True`` the latest unfinished run of that kind is continued,
+    otherwise (or if there is none) a new run is started.
+
+    Args:
+        path: SQLite file
+        kind: Type of job, separates the crawler and the OSM runs
+        resume: Continue the last unfinished run
+        output: Output file of a new run (stored so a resumed run can append to it)
+    """
+
+    def __init__(self, path, kind: str, resume: bool = False, output: Optional[str] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.kind = kind
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+        row = None
+        if resume:
+            row = self._db.execute(
+                "SELECT id, output FROM runs WHERE kind = ? AND finished_at IS NULL "
+                "ORDER BY id DESC LIMIT 1", (kind,)).fetchone()
+        self.resumed = row is not None
+        if row is None:
+            cur = self._db.execute("INSERT INTO runs (kind, output, started_at) VALUES (?, ?, ?)",
+                                   (kind, output, _now()))
+            self._db.commit()
+            row = (cur.lastrowid, output)
+        self.run_id, self.output = row
+        self._done = {key for (key,) in self._db.execute(
+            "SELECT key FROM done WHERE run_id = ?", (self.run_id,))}
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def is_done(self, key: str) -> bool:
+        """True if the unit was completed in this run (before or after a resume)."""
+        return key in self._done
+
+    def mark_done(self, key: str, payload: Any = None) -> None:
+        """Record a completed unit with an optional JSON-serializable payload."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO done (run_id, key, payload, done_at) VALUES (?, ?, ?, ?)",
+            (self.run_id, key, json.dumps(payload, ensure_ascii=False), _now()))
+        self._db.commit()
+        self._done.add(key)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Yield (key, payload) of all completed units of this run."""
+        for key, payload in self._db.execute(
+                "SELECT key, payload FROM done WHERE run_id = ? ORDER BY rowid", (self.run_id,)):
+            yield key, json.loads(payload) if payload is not None else None
+
+    def finish(self) -> None:
+        """Mark the run as finished, so it is not resumed again."""
+        self._db.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (_now(), self.run_id))
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "CrawlJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def describe(self) -> str:
+        """One-line description for run reports."""
+        state = "resumed" if self.resumed else "started"
+        return f"{self.kind} run #{self.run_id} {state}, {len(self._done)} units already done"
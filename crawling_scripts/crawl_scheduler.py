@@ -0,0 +1,117 @@
+"""
+Crawl Scheduler Module
+
+Runs fetch jobs for many hosts in parallel while staying polite towards each
+individual host: at most one request per domain is in flight and consecutive
+requests to the same domain are separated by a minimum delay. The total number
+of concurrently crawled domains is capped by a global worker limit.
+
+Author: DSSG Berlin Volunteers
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+def host_of(url: str) -> str:
+    """Return the lower-cased host part of a URL (empty string if missing)."""
+    return urlparse(url.strip()).netloc.lower()
+
+
+class HostScheduler:
+    """
+    Per-host politeness scheduler backed by a thread pool.
+
+    Jobs are grouped by host. Each host is drained sequentially by a single
+    worker, so one host never sees more than one request at a time, while
+    different hosts are crawled concurrently up to ``max_workers``.
+
+    Args:
+        max_workers: Global cap on the number of hosts crawled concurrently
+        host_delay: Minimum delay in seconds between two requests to one host
+    """
+
+    def __init__(self, max_workers: int = 16, host_delay: float = 1.0):
+        self.max_workers = max(1, int(max_workers))
+        self.host_delay = max(0.0, float(host_delay))
+
+    def _drain_host(self, host: str, jobs: List[Tuple[int, Any]], fn: Callable[[Any], Any],
+                    results: "queue.Queue", local: Optional[Callable[[Any], bool]],
+                    stop: threading.Event) -> None:
+        last_finished = None
+        for index, item in jobs:
+            if stop.is_set():
+                return
+            is_local = local is not None and local(item)
+            if last_finished is not None and not is_local:
+                wait = self.host_delay - (time.monotonic() - last_finished)
+                if wait > 0 and stop.wait(wait):
+                    return
+            try:
+                results.put((index, item, fn(item), None))
+            except Exception as e:  # handed over to the consuming thread
+                results.put((index, item, None, e))
+            if not is_local:
+                last_finished = time.monotonic()
+
+    def run(self, fn: Callable[[Any], Any], items: Iterable[Any],
+            key: Callable[[Any], str] = host_of,
+            local: Optional[Callable[[Any], bool]] = None) -> Iterator[Tuple[int, Any, Any]]:
+        """
+        Apply ``fn`` to every item and yield results as soon as they complete.
+
+        Args:
+            fn: Function called with a single item (e.g. a URL)
+            items: Items to process; their order is kept within each host
+            key: Function mapping an item to its host
+            local: Optional predicate for items served without network
+                (e.g. from a cache); these skip the per-host delay
+
+        Yields:
+            Tuples of (input index, item, result) in completion order
+
+        If ``fn`` raises, the exception is re-raised here after the other hosts
+        have been stopped (requests already in flight are finished, no new ones start).
+        """
+        by_host: Dict[str, List[Tuple[int, Any]]] = OrderedDict()
+        total = 0
+        for index, item in enumerate(items):
+            by_host.setdefault(key(item), []).append((index, item))
+            total += 1
+        if not total:
+            return
+
+        results: "queue.Queue" = queue.Queue()
+        workers = min(self.max_workers, len(by_host))
+        # Busiest hosts first, so the slowest domain starts as early as possible
+        hosts = sorted(by_host, key=lambda h: len(by_host[h]), reverse=True)
+
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl") as executor:
+            try:
+                for host in hosts:
+                    executor.submit(self._drain_host, host, by_host[host], fn, results, local, stop)
+                for _ in range(total):
+                    index, item, result, error = results.get()
+                    if error is not None:
+                        raise error
+                    yield index, item, result
+            finally:
+                # on an error (or when the caller stops iterating) do not drain the other hosts
+                stop.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any],
+            key: Callable[[Any], str] = host_of,
+            local: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        """Like ``run`` but return all results in input order."""
+        items = list(items)
+        ordered: List[Any] = [None] * len(items)
+        for index, _, result in self.run(fn, items, key=key, local=local):
+            ordered[index] = result
+        return ordered
@@ -2,7 +2,6 @@
 import re
 import time
 from pathlib import Path
-from random import uniform
 from typing import Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 import json
@@ -10,14 +9,32 @@ from datetime import datetime
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup as bs
-from scraping_utils import fetch_webpage, extract_impressum_data
+from scraping_utils import fetch_webpage, extract_impressum_data, host_delay_of, normalize
+from crawl_scheduler import HostScheduler, host_of
+import http_client
+from response_cache import OfflineCacheMiss, open_cache
+from incremental import RecrawlManifest, UNCHANGED
+from jsonl_store import JsonlWriter, iter_records, output_path
+from crawl_journal import CrawlJournal
+from parsed_page import HTML_PARSER
+from keyword_matcher import get_matcher
+from rate_limiter import throttle
+from sitemap_reader import SITEMAP_ERRORS, is_sitemap_url, iter_sitemap
+from robots_policy import RobotsCache
 
 SCRAPING_CONFIG = {
     'user_agent': 'AWO-Research-Bot/1.0 (Research project; contact@awo.org)',
-    'delay_min': 1.0,
-    'delay_max': 3.0,
     'timeout': 10,
     'max_retries': 3,
+    'max_workers': 16,   # hosts crawled in parallel
+    'host_delay': 1.0,   # min. seconds between two requests to the same host (shared rate limiter), 0: no delay
+    'cache_dir': './raw_html_text/http_cache',  # None disables the response cache
+    'cache_ttl': 7 * 24 * 3600,                  # seconds before a cached page is revalidated
+    'cache_max_bytes': 2 * 1024 ** 3,
+    'offline': False,    # serve only from cache, never touch the network
+    'output_format': 'jsonl',  # 'jsonl' streams every page to disk, 'json' writes one list at the end
+    'compression': None,       # for jsonl: None, 'gzip' or 'zstd'
+    'respect_robots': True,    # check every URL against the cached robots.txt of its host
 }
 
 HEADERS = {"User-Agent": "Mozilla/5.0 (AWO-Crawler/1.2)"}
@@ -217,15 +234,21 @@ def fetch_webpage(url: str, config: Dict = None):
         config = SCRAPING_CONFIG
 
     headers = {"User-Agent": config['user_agent']}
+    cache = open_cache(config)
 
     for attempt in range(config['max_retries']):
         try:
-            time.sleep(uniform(config['delay_min'], config['delay_max']))
+            if cache is None or not cache.serves_locally(url):
+                throttle(url, host_delay_of(config))
 
-            response = requests.get(url, headers=headers, timeout=config['timeout'])
+            get = cache.get if cache is not None else http_client.get
+            response = get(url, headers=headers, timeout=config['timeout'])
             response.raise_for_status()
             return True, url, response.text, None
 
+        except OfflineCacheMiss as e:
+            return False, url, None, str(e)
+
         except Exception as e:
             err = f"[{attempt+1}/{config['max_retries']}] {e}"
             if attempt == config['max_retries'] - 1:
@@ -245,6 +268,12 @@ def get_urls_by_config(config_key) -> list:
             urls.extend(config.get('target_url', []))
     return urls
 
+def get_region_by_url(url):
+    for region, data in PAGE_SITE_CONFIG.items():
+        if url in data['target_url']:
+            return region
+    return None
+
 def get_page_attribute_by_url(url):
     for region, data in PAGE_SITE_CONFIG.items():
         for t in data['target_url']:
@@ -253,16 +282,15 @@ def get_page_attribute_by_url(url):
                 return  data['page_attribute']    
     return None
 
-def normalize(url: str) -> str:
-    """Normalize URL for consistent comparison."""
-    return url.strip().rstrip('/')
-
-def fetch_html_xml(url, headers=HEADERS, timeout=20, retries = SCRAPING_CONFIG.get('max_retries',3)) -> bs | None:
+def fetch_html_xml(url, headers=HEADERS, timeout=20, retries = SCRAPING_CONFIG.get('max_retries',3), cache=None,
+                   host_delay=SCRAPING_CONFIG['host_delay']) -> bs | None:
     """
     Fetch and parse HTML content from a URL using BeautifulSoup.
         url (str): The target web page URL.
         headers (dict, optional): HTTP headers (User-Agent recommended).
         timeout (int, optional): Timeout in seconds for the request.
+        cache (ResponseCache, optional): Response cache to fetch through.
+        host_delay (float, optional): Min. seconds between requests to the host (0: no delay).
     Returns:
         BeautifulSoup: Parsed BeautifulSoup(bs) object if successful, else None.
     """
@@ -277,21 +305,24 @@ def fetch_html_xml(url, headers=HEADERS, timeout=20, retries = SCRAPING_CONFIG.g
     if url.lower().startswith("mailto:"):
         email = url.replace("mailto:", "").strip()
         html = f"<html><body><p>Email: {email}</p></body></html>"
-        #return bs(html, "html5lib")
-        return bs("<html></html>", "html5lib")
+        #return bs(html, HTML_PARSER)
+        return bs("<html></html>", HTML_PARSER)
 
     if url.lower().startswith("tel:"):
         phone = url.replace("tel:", "").strip()
         html = f"<html><body><p>Phone: {phone}</p></body></html>"
-        return bs("<html></html>", "html5lib")
+        return bs("<html></html>", HTML_PARSER)
 
     if url.lower().endswith((".pdf", ".jpg", ".jpeg", ".png", ".gif", ".tif", ".bmp")):
         print(f"Skipping non-HTML document: {url}")
         # Return an empty soup object to avoid NoneType errors later
-        return bs("<html></html>", "html5lib")
+        return bs("<html></html>", HTML_PARSER)
     for attempt in range(retries +1):
         try:
-            response = requests.get(url, headers=headers, timeout=timeout)
+            if cache is None or not cache.serves_locally(url):
+                throttle(url, host_delay)
+            get = cache.get if cache is not None else http_client.get
+            response = get(url, headers=headers, timeout=timeout)
             response.raise_for_status()  # raises HTTPError for bad status codes
             content_type = (response.headers.get("Content-Type") or "")
             text = response.text.strip()
@@ -300,7 +331,11 @@ def fetch_html_xml(url, headers=HEADERS, timeout=20, retries = SCRAPING_CONFIG.g
             is_xml_by_content = text.startswith("<?xml") or text.startswith("<urlset") or text.startswith("<sitemapindex")
             if is_xml_by_header or is_xml_by_content:
                 return bs(text, "xml")
-            return bs(response.text, "html5lib")
+            return bs(response.text, HTML_PARSER)
+
+        except OfflineCacheMiss as e:
+            print(f"Skipping {url}: {e}")
+            break
 
         except requests.exceptions.RequestException as e:
             print(f"[Attempt {attempt}/{retries}] Error fetching {url}: {e}")
@@ -311,9 +346,9 @@ def fetch_html_xml(url, headers=HEADERS, timeout=20, retries = SCRAPING_CONFIG.g
             else:
                 print(f"Failed to fetch {url} after {retries} attempts.")
         # Return an empty soup to avoid NoneType errors later
-    return bs("<html></html>", "html5lib")
+    return bs("<html></html>", HTML_PARSER)
 
-def extract_links(soup:bs, base_url:str, attribute = None)-> list:
+def extract_links(soup:bs, base_url:str, attribute = None, region = None)-> list:
     """
     Extracts pagination links from a BeautifulSoup  (bs) object.
     It extracts links from HTML and XML sites 
@@ -325,14 +360,11 @@ def extract_links(soup:bs, base_url:str, attribute = None)-> list:
 
      attribute : str (optional)
         A **class string** (e.g. "simple-sitemap-page main")
+
+    region : str (optional)
+        PAGE_SITE_CONFIG key, adds the region's link exclusions (keyword_matcher.REGION_KEYWORDS)
     """
-    exclude_keywords = [
-        "datenschutz", "stellen", "job", "beitrit", "struktur", "spenden", 'formular', 'herunterladen', 'sitemap', 'testseite',
-        "veranstaltungen", "sprache", "newsletter", 'news', 'suche', 'agb', 'mailto:', 'tel:', 'fax', 'presse',
-        'transparent', 'vorstand', 'freiwilig', 'download', 'beschwerde','facebook', 'feedback', "kontrast", 'praesidium',
-        'barrierefrei', 'instagram', 'twitter', 'youtube', 'linkedin', 'team', 'leitbild', 'leitsätze', 'geschichte', 
-        'eingabehilfe', 'warenkorb', 'mitmachen', 'termin', 'aktuell', 'chronik', 'satzung', 'bariere', 'vollzeit', 'teilzeit', 'uploads']
-    exclude_re = re.compile("|".join(exclude_keywords), re.I)
+    excluded = get_matcher('link_exclude', region)  # compiled once, see keyword_matcher.py
     links = []
     unique_links=set()
     results = []
@@ -352,7 +384,7 @@ def extract_links(soup:bs, base_url:str, attribute = None)-> list:
             if not href:
                 continue
             href_lower = href.lower()
-            if exclude_re.search(href_lower):
+            if excluded.search(href_lower):
                 continue
             if href_lower not in unique_links:
                 unique_links.add(href_lower)
@@ -393,10 +425,8 @@ def extract_links(soup:bs, base_url:str, attribute = None)-> list:
         if href.startswith("de/") and not href.startswith("/"):
             href = "/" + href
         full_url = urljoin(base_domain, href)
-        lower_text = text.lower()
-        full_url_lower = full_url.lower()
         #filter by keywords
-        if exclude_re.search(lower_text) or exclude_re.search(full_url_lower):
+        if excluded.search(text, full_url):
             continue
         norm = normalize(full_url)
         if norm not in unique_links:
@@ -406,6 +436,39 @@ def extract_links(soup:bs, base_url:str, attribute = None)-> list:
     return links
 
 
+def fetch_listing(url, cache=None, host_delay=SCRAPING_CONFIG['host_delay'], headers=HEADERS):
+    """
+    Fetch a link listing page.
+    XML sitemaps (.xml, .xml.gz) are streamed by sitemap_reader (following sitemap indexes),
+    all other pages are parsed by fetch_html_xml.
+    Returns:
+        list of SitemapEntry for sitemaps (None if the sitemap itself could not be read),
+        else BeautifulSoup(bs) object.
+    """
+    if is_sitemap_url(url):
+        try:
+            return list(iter_sitemap(url, headers=headers, cache=cache, raise_errors=True))
+        except SITEMAP_ERRORS:
+            return None
+    return fetch_html_xml(url, headers=headers, cache=cache, host_delay=host_delay)
+
+
+def listing_links(listing, base_url: str, attribute=None, region=None) -> List[Tuple[str, Optional[datetime]]]:
+    """
+    Links of a listing fetched by fetch_listing, with the sitemap <lastmod> (None for HTML pages).
+    Sitemap URLs are filtered and lower-cased like the <loc> links of extract_links.
+    """
+    if not isinstance(listing, list):
+        return [(link, None) for link in extract_links(listing, base_url, attribute=attribute, region=region)]
+    excluded = get_matcher('link_exclude', region)
+    links = {}
+    for entry in listing:
+        href_lower = entry.loc.lower()
+        if not excluded.search(href_lower):
+            links.setdefault(href_lower, entry.lastmod)
+    return list(links.items())
+
+
 
 # sites_with_links = get_urls_by_config('page_with_links') 
 # sites_with_contacts = get_urls_by_config('page_with_contacts')
@@ -413,7 +476,8 @@ def extract_links(soup:bs, base_url:str, attribute = None)-> list:
 
 
 
-def scrape_all_html_text():
+def scrape_all_html_text(config: Dict = None, incremental: bool = False, resume: bool = False,
+                         return_path: bool = False):
     """
     Clean, safe scraping of:
     - pages_with_links -> extract links from page -> fetch each link
@@ -421,43 +485,87 @@ def scrape_all_html_text():
     - pages with class-based attribute -> extract links and fetch
     
     All HTML is saved once, deduplicated.
+    Hosts are crawled in parallel by HostScheduler (one request in flight per host,
+    at most `max_workers` hosts at once); the shared rate limiter keeps `host_delay`
+    seconds between requests to a host, also across concurrently running crawlers.
+
+    Every run updates the text fingerprints in raw_html_text/manifest.json.
+    With incremental=True only new, changed and deleted pages (field "change")
+    are saved, so the LLM contact extractor only sees the delta.
+
+    With output_format 'jsonl' every page is appended to the results file as
+    soon as it is fetched (read it back with jsonl_store.iter_records).
+    Completed URLs are recorded in raw_html_text/crawl_journal.sqlite; with
+    resume=True an interrupted run skips them and appends to its results file.
+    With respect_robots every URL is checked against the robots.txt of its host
+    (fetched once per host and run); a Crawl-delay slows that host down.
+    Returns the list of saved records; with return_path=True the path of the
+    results file instead, so a jsonl run never holds all records in memory.
     """
+    if config is None:
+        config = SCRAPING_CONFIG
+
+    # the scheduler keeps one request per host in flight, fetch_webpage's rate limiter spaces them
+    scheduler = HostScheduler(max_workers=config.get('max_workers', 16), host_delay=0.0)
+    cache = open_cache(config)
+    is_cached = cache.serves_locally if cache is not None else None
+    robots = RobotsCache(user_agent=config['user_agent'], cache=cache) if config.get('respect_robots', True) else None
+    allowed = robots.can_fetch if robots is not None else (lambda url: True)
+
+    def fetch_allowed_listing(site):
+        if not allowed(site):
+            print(f"  🚫 {site} disallowed by robots.txt")
+            return None
+        # same user agent as the one robots.txt was checked for
+        return fetch_listing(site, cache=cache, host_delay=host_delay_of(config),
+                             headers={"User-Agent": config['user_agent']})
+
+    def fetch_allowed_page(job):
+        if not allowed(job[1]):
+            return False, job[1], None, "Disallowed by robots.txt"
+        return fetch_webpage(job[1], config)
+
+    OUT_DIR = Path("./raw_html_text")
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = RecrawlManifest(OUT_DIR / "manifest.json")
 
     visited = set()
-    html_results = []
+    jobs = []  # (source, normalized url) in the order of the sequential crawl
+    lastmods = {}  # normalized url -> <lastmod> of pages listed in sitemaps
 
     # --------------------------
-    # 1) Pages with links
+    # 0) Fetch all link listing pages in parallel
     # --------------------------
 
     sites_with_links = get_urls_by_config('page_with_links')
+    sites_with_page_attribute = get_urls_by_config('page_attribute')
+    listing_pages = list(dict.fromkeys(sites_with_links + sites_with_page_attribute))
 
-    for site in sites_with_links:
-        print(f"\n🔎 Extracting links from main page: {site}")
+    print(f"\n🔎 Extracting links from {len(listing_pages)} main pages...")
+    listings = dict(zip(listing_pages, scheduler.map(fetch_allowed_listing, listing_pages, local=is_cached)))
 
-        soup = fetch_html_xml(site)
-        if soup is None:
-            print("  ❌ Failed to fetch page")
+    # --------------------------
+    # 1) Pages with links
+    # --------------------------
+
+    for site in sites_with_links:
+        listing = listings.get(site)
+        if listing is None:
+            print(f"  ❌ Failed to fetch page {site}")
             continue
 
-        links = extract_links(soup, site)
+        links = listing_links(listing, site, region=get_region_by_url(site))
 
-        print(f"  → Found {len(links)} links")
+        print(f"  {site} → Found {len(links)} links")
 
-        for link in links:
+        for link, lastmod in links:
             norm = normalize(link)
             if norm in visited:
                 continue
             visited.add(norm)
-
-            success, url_fetched, content, error = fetch_webpage(norm)
-            html_results.append({
-                "source": site,
-                "url": url_fetched,
-                "success": success,
-                "html_text": content,
-                "error": error
-            })
+            jobs.append((site, norm))
+            if lastmod is not None:
+                lastmods[norm] = lastmod
 
     # --------------------------
     # 2) Direct contact pages
@@ -470,67 +578,160 @@ def scrape_all_html_text():
         if norm in visited:
             continue
         visited.add(norm)
-
-        print(f"\n📄 Fetching contact page: {site}")
-
-        success, url_fetched, content, error = fetch_webpage(norm)
-        html_results.append({
-            "source": "direct_contact",
-            "url": url_fetched,
-            "success": success,
-            "html_text": content,
-            "error": error
-        })
+        jobs.append(("direct_contact", norm))
 
     # --------------------------
     # 3) Pages with attribute-based link extraction
     # --------------------------
 
-    sites_with_page_attribute = get_urls_by_config('page_attribute')
-
     for site in sites_with_page_attribute:
-        print(f"\n🔎 Extracting classified links from: {site}")
-
         attr = get_page_attribute_by_url(site)
 
-        soup = fetch_html_xml(site)
-        if soup is None:
+        listing = listings.get(site)
+        if listing is None:
             continue
 
-        links = extract_links(soup, site, attribute=attr)
-        print(f"  → Found {len(links)} links")
+        links = listing_links(listing, site, attribute=attr, region=get_region_by_url(site))
+        print(f"  {site} (class:{attr}) → Found {len(links)} links")
 
-        for link in links:
+        for link, lastmod in links:
             norm = normalize(link)
             if norm in visited:
                 continue
             visited.add(norm)
+            jobs.append((f"class:{attr}", norm))
+            if lastmod is not None:
+                lastmods[norm] = lastmod
+
+    # --------------------------
+    # 4) Fetch all pages, hosts in parallel, streaming to the results file
+    # --------------------------
 
-            success, url_fetched, content, error = fetch_webpage(norm)
-            html_results.append({
-                "source": f"class:{attr}",
+    stem = f"results_html_text_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    streaming = config.get('output_format', 'jsonl') == 'jsonl'
+    if resume and not streaming:
+        raise ValueError("resume needs output_format 'jsonl' (pages are written as they are fetched)")
+    if streaming:
+        output_file = output_path(OUT_DIR, stem, config.get('compression'))
+    else:
+        output_file = OUT_DIR / f"{stem}.json"
+        html_results = [None] * len(jobs)
+
+    journal = CrawlJournal(OUT_DIR / "crawl_journal.sqlite", kind="html", resume=resume,
+                           output=str(output_file))
+    print(f"\n📒 {journal.describe()}")
+    if journal.resumed and journal.output:
+        output_file = Path(journal.output)
+    for url, entry in journal.items():
+        manifest.restore(url, entry)
+    pending = [job for job in jobs if not journal.is_done(job[1])]
+    if incremental and lastmods:
+        # pages whose sitemap <lastmod> predates the last fetch are not fetched again
+        unchanged = {url for _, url in pending if manifest.unchanged_since(url, lastmods.get(url))}
+        for url in unchanged:
+            manifest.carry(url)
+            journal.mark_done(url, manifest.current[url])
+        pending = [job for job in pending if job[1] not in unchanged]
+        print(f"🗺 Skipping {len(unchanged)} pages unchanged since the last run (sitemap lastmod)")
+
+    if streaming:
+        writer = JsonlWriter(output_file)
+
+    print(f"\n📄 Fetching {len(pending)} of {len(jobs)} pages...")
+    started = time.monotonic()
+
+    try:
+        for done, (index, (source, url), result) in enumerate(
+                scheduler.run(fetch_allowed_page, pending,
+                              key=lambda job: host_of(job[1]),
+                              local=(lambda job: is_cached(job[1])) if is_cached else None), 1):
+            success, url_fetched, content, error = result
+            record = {
+                "source": source,
                 "url": url_fetched,
                 "success": success,
                 "html_text": content,
                 "error": error
-            })
-
-    # --------------------------
-    # Save results
-    # --------------------------
-
-    OUT_DIR = Path("./raw_html_text")
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-    output_file = OUT_DIR / f"results_html_text_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    print(f"\n💾 Saving {len(html_results)} HTML pages...")
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(html_results, f, ensure_ascii=False, indent=2)
-
-    print(f"✅ Done. Saved to {output_file.name}")
-
-    return html_results
+            }
+            if success:
+                change = manifest.classify(url, source, content)
+            else:
+                change = None
+                manifest.keep(url)
+            status = "✓" if success else "❌"
+            print(f"  [{done}/{len(pending)}] {status} {url}" + (f" ({change})" if change else ""))
+
+            if incremental:
+                if change == UNCHANGED:
+                    # nothing to write, but journaled so a resumed run does not fetch it again
+                    journal.mark_done(url, manifest.current.get(url))
+                    continue
+                record["change"] = change
+            if streaming:
+                writer.write(record)
+            else:
+                html_results[index] = record
+            if success:
+                journal.mark_done(url, manifest.current.get(url))
+
+        print(f"⏱ Fetched {len(pending)} pages in {time.monotonic() - started:.1f}s")
+        print(f"🔌 {http_client.format_stats()}")
+        if robots is not None:
+            print(f"🤖 {robots.format_stats()}")
+        if cache is not None:
+            print(f"🗄 {cache.format_stats()}")
+            if not cache.offline:
+                cache.evict()
+
+        deleted = manifest.deleted(url for _, url in jobs)
+        print(f"🔁 {manifest.summary()}")
+
+        # --------------------------
+        # Save results
+        # --------------------------
+
+        if streaming:
+            if incremental:
+                for record in deleted:
+                    writer.write(record)
+            saved = writer.count
+        else:
+            html_results = [r for r in html_results if r is not None]
+            if incremental:
+                html_results.extend(deleted)
+            saved = len(html_results)
+            print(f"\n💾 Saving {saved} HTML pages...")
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(html_results, f, ensure_ascii=False, indent=2)
+        manifest.save()
+        journal.finish()
+    finally:
+        if streaming:
+            writer.close()
+        journal.close()
+
+    print(f"✅ Done. Saved {saved} pages to {output_file.name}")
+
+    if return_path:
+        return output_file
+    return list(iter_records(output_file)) if streaming else html_results
 
 if __name__== "__main__":
-    scrape_all_html_text()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crawl AWO regional pages into raw_html_text/")
+    parser.add_argument("--incremental", action="store_true",
+                        help="save only pages that are new, changed or deleted since the last run")
+    parser.add_argument("--offline", action="store_true",
+                        help="serve pages only from the response cache, no network access")
+    parser.add_argument("--format", choices=["jsonl", "json"], default=SCRAPING_CONFIG['output_format'],
+                        help="jsonl streams every page to disk as it is fetched")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default=None,
+                        help="compress the jsonl results file")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the last interrupted run, skipping pages already fetched")
+    args = parser.parse_args()
+
+    scrape_all_html_text({**SCRAPING_CONFIG, 'offline': args.offline,
+                          'output_format': args.format, 'compression': args.compression},
+                         incremental=args.incremental, resume=args.resume, return_path=True)
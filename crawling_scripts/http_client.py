@@ -0,0 +1,146 @@
+"""
+HTTP Client Module
+
+Shared HTTP layer for all fetchers of the AWO project (crawlers and OSM scripts).
+A single requests.Session keeps per-host connection pools alive, so repeated
+requests to the same host reuse one TCP/TLS connection instead of opening a new
+one each time. Compression is negotiated for every encoding urllib3 can decode.
+
+Author: DSSG Berlin Volunteers
+"""
+
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import make_headers
+
+# Default pool configuration
+HTTP_CONFIG = {
+    'pool_connections': 64,  # number of per-host pools kept alive
+    'pool_maxsize': 8,       # max. open connections per host
+}
+
+# gzip/deflate plus br/zstd when the matching decoder packages are installed
+ACCEPT_ENCODING = make_headers(accept_encoding=True)['accept-encoding']
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_stats = {'requests': 0, 'connections': 0}
+
+
+def _count(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count('connections')
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count('connections')
+        return super()._new_conn()
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools count newly opened connections."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+def _build_session(pool_connections: int, pool_maxsize: int) -> requests.Session:
+    session = requests.Session()
+    adapter = PooledAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Accept-Encoding': ACCEPT_ENCODING, 'Connection': 'keep-alive'})
+    return session
+
+
+def configure(pool_connections: int = None, pool_maxsize: int = None) -> requests.Session:
+    """
+    (Re)create the shared session with a new pool configuration.
+
+    Args:
+        pool_connections: Number of per-host pools to keep
+        pool_maxsize: Maximum number of connections per host
+
+    Returns:
+        The new shared session
+    """
+    global _session
+    if pool_connections is not None:
+        HTTP_CONFIG['pool_connections'] = pool_connections
+    if pool_maxsize is not None:
+        HTTP_CONFIG['pool_maxsize'] = pool_maxsize
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = _build_session(HTTP_CONFIG['pool_connections'], HTTP_CONFIG['pool_maxsize'])
+        return _session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide shared session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session(HTTP_CONFIG['pool_connections'], HTTP_CONFIG['pool_maxsize'])
+    return _session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Send a request through the shared session (same arguments as requests.request)."""
+    _count('requests')
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Drop-in replacement for requests.get using the shared session."""
+    return request('GET', url, **kwargs)
+
+
+def connection_stats() -> Dict[str, float]:
+    """
+    Report how well connections were reused since start (or last reset).
+
+    Returns:
+        Dictionary with number of requests, newly opened connections,
+        reused requests and the reuse ratio
+    """
+    with _lock:
+        requests_sent = _stats['requests']
+        connections = _stats['connections']
+    reused = max(0, requests_sent - connections)
+    return {
+        'requests': requests_sent,
+        'connections': connections,
+        'reused': reused,
+        'reuse_rate': reused / requests_sent if requests_sent else 0.0,
+    }
+
+
+def reset_stats() -> None:
+    """Reset the request/connection counters."""
+    with _lock:
+        _stats['requests'] = 0
+        _stats['connections'] = 0
+
+
+def format_stats() -> str:
+    """One-line summary of connection reuse for run reports."""
+    stats = connection_stats()
+    return (f"{stats['requests']} requests over {stats['connections']} connections "
+            f"({stats['reused']} reused, {stats['reuse_rate']:.0%})")
@@ -0,0 +1,169 @@
+"""
+Incremental Recrawl Module
+
+Keeps a manifest of text fingerprints of all pages fetched by the crawler, so a
+new run can tell which pages are new, changed, unchanged or gone since the
+previous run. In incremental mode only the delta is written to the results
+file, which keeps the downstream LLM contact extractor from reprocessing pages
+whose text did not change.
+
+Author: DSSG Berlin Volunteers
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from bs4 import BeautifulSoup
+
+NEW = 'new'
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+DELETED = 'deleted'
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def page_fingerprint(html_content: str) -> str:
+    """
+    Fingerprint the visible text of a page.
+
+    Markup, attribute values and whitespace changes (e.g. cache busters or
+    nonces) do not change the fingerprint, only the extracted text does.
+
+    Args:
+        html_content: HTML content as string
+
+    Returns:
+        SHA-256 hex digest of the whitespace-normalized page text
+    """
+    text = BeautifulSoup(html_content or '', 'html.parser').get_text(' ')
+    text = _WHITESPACE_RE.sub(' ', text).strip()
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class RecrawlManifest:
+    """
+    Fingerprints of the previous run, stored as JSON ``{url: {...}}``.
+
+    Args:
+        path: Path of the manifest file
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.previous: Dict[str, Dict] = {}
+        if self.path.exists():
+            try:
+                self.previous = json.loads(self.path.read_text(encoding='utf-8'))
+            except ValueError:
+                print(f"Ignoring unreadable manifest {self.path}")
+        self.current: Dict[str, Dict] = {}
+        self.counts = {NEW: 0, CHANGED: 0, UNCHANGED: 0, DELETED: 0, 'failed': 0}
+
+    def classify(self, url: str, source: str, html_content: str) -> str:
+        """
+        Record a fetched page and return whether it is new, changed or unchanged.
+
+        Args:
+            url: Normalized page URL
+            source: Source label of the page (listing page, direct contact, ...)
+            html_content: Fetched HTML
+
+        Returns:
+            One of NEW, CHANGED, UNCHANGED
+        """
+        fingerprint = page_fingerprint(html_content)
+        old = self.previous.get(url)
+        if old is None:
+            status = NEW
+        elif old.get('fingerprint') != fingerprint:
+            status = CHANGED
+        else:
+            status = UNCHANGED
+        self.current[url] = {
+            'fingerprint': fingerprint,
+            'source': source,
+            'seen_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.counts[status] += 1
+        return status
+
+    def unchanged_since(self, url: str, lastmod: Optional[datetime]) -> bool:
+        """
+        True if the page was fetched in the previous run after its sitemap <lastmod>.
+
+        Args:
+            url: Normalized page URL
+            lastmod: Timezone-aware last modification time from the sitemap (or None)
+
+        Returns:
+            False if lastmod is unknown or the page was not seen before
+        """
+        old = self.previous.get(url)
+        if lastmod is None or not old or not old.get('fingerprint') or not old.get('seen_at'):
+            return False
+        try:
+            seen_at = datetime.fromisoformat(old['seen_at']).astimezone()
+        except ValueError:
+            return False
+        return lastmod <= seen_at
+
+    def carry(self, url: str) -> None:
+        """Carry over the previous entry of a page skipped as unchanged without fetching it."""
+        self.current[url] = self.previous[url]
+        self.counts[UNCHANGED] += 1
+
+    def restore(self, url: str, entry: Dict) -> None:
+        """Re-add the entry of a page classified before a resumed run was interrupted."""
+        if entry:
+            self.current[url] = entry
+
+    def keep(self, url: str) -> None:
+        """Carry over the previous entry of a page that could not be fetched this run."""
+        self.counts['failed'] += 1
+        if url in self.previous:
+            self.current[url] = self.previous[url]
+
+    def deleted(self, crawled_urls: Iterable[str]) -> List[Dict]:
+        """
+        Return records for pages of the previous run that were not crawled again.
+
+        Args:
+            crawled_urls: All URLs scheduled in the current run
+
+        Returns:
+            List of records in the html_results format with ``change`` = DELETED
+        """
+        crawled = set(crawled_urls)
+        records = []
+        for url, entry in self.previous.items():
+            if url in crawled:
+                continue
+            records.append({
+                "source": entry.get('source'),
+                "url": url,
+                "success": False,
+                "html_text": None,
+                "error": None,
+                "change": DELETED,
+            })
+        self.counts[DELETED] += len(records)
+        return records
+
+    def save(self) -> None:
+        """Atomically replace the manifest with the fingerprints of the current run."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.current, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+    def summary(self) -> str:
+        """One-line summary of the delta for run reports."""
+        c = self.counts
+        return (f"{c[NEW]} new, {c[CHANGED]} changed, {c[DELETED]} deleted, "
+                f"{c[UNCHANGED]} unchanged (skipped), {c['failed']} failed")
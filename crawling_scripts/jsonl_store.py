@@ -0,0 +1,154 @@
+"""
+JSONL Record Store Module
+
+Streaming writer and lazy reader for crawl results. Every page is appended as
+one compact JSON line as soon as it is fetched, so memory stays constant and a
+crash only loses the page in flight. Files ending in ``.gz`` are gzip-compressed,
+files ending in ``.zst`` are zstd-compressed (requires the ``zstandard`` package).
+
+Author: DSSG Berlin Volunteers
+"""
+
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for .zst files
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+def _compression_of(path: Path) -> Optional[str]:
+    suffix = path.suffix.lower()
+    if suffix == '.gz':
+        return 'gzip'
+    if suffix == '.zst':
+        return 'zstd'
+    return None
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise ImportError("zstd compression requires the 'zstandard' package (pip install zstandard)")
+
+
+def output_path(directory: Path, stem: str, compression: Optional[str] = None) -> Path:
+    """
+    Build the path of a JSONL results file.
+
+    Args:
+        directory: Output directory
+        stem: File name without suffix
+        compression: None, 'gzip' or 'zstd'
+
+    Returns:
+        Path like ``directory/stem.jsonl.gz``
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression '{compression}', use one of {list(COMPRESSION_SUFFIXES)}")
+    return Path(directory) / f"{stem}.jsonl{COMPRESSION_SUFFIXES[compression]}"
+
+
+class JsonlWriter:
+    """
+    Append-only JSONL writer, flushed after every record.
+
+    Compression is chosen from the file suffix. Appending to an existing file
+    adds a new gzip member / zstd frame, which the reader handles transparently.
+
+    Args:
+        path: Output file (``.jsonl``, ``.jsonl.gz`` or ``.jsonl.zst``)
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compression = _compression_of(self.path)
+        self.count = 0
+        self._raw = None
+        if self.compression == 'gzip':
+            self._fh = gzip.open(self.path, 'ab')
+        elif self.compression == 'zstd':
+            _require_zstandard()
+            self._raw = open(self.path, 'ab')
+            self._fh = zstandard.ZstdCompressor().stream_writer(self._raw)
+        else:
+            self._fh = open(self.path, 'ab')
+
+    def write(self, record: Dict) -> None:
+        """Append one record and flush it to disk."""
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        self._fh.write(line.encode('utf-8'))
+        if self.compression == 'zstd':
+            self._fh.flush(zstandard.FLUSH_BLOCK)
+            self._raw.flush()
+        else:
+            self._fh.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        """Finish the compressed stream and close the file."""
+        if self._fh is None:
+            return
+        self._fh.close()
+        if self._raw is not None and not self._raw.closed:
+            self._raw.close()
+        self._fh = None
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _open_text(path: Path):
+    compression = _compression_of(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if compression == 'zstd':
+        _require_zstandard()
+        raw = open(path, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_records(path) -> Iterator[Dict]:
+    """
+    Lazily yield records from a results file with constant memory.
+
+    Supports ``.jsonl`` (optionally ``.gz``/``.zst``) and, for older runs, the
+    plain ``.json`` list format (which is loaded at once). A truncated last
+    line, e.g. from a crashed run, is skipped.
+
+    Args:
+        path: Results file
+
+    Yields:
+        One record (dict) per page
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+
+    with _open_text(path) as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    print(f"Skipping incomplete record in {path.name}")
+        except EOFError:
+            # gzip stream of a killed run has no trailer, all flushed records were read
+            pass
@@ -0,0 +1,110 @@
+"""
+Keyword Matcher Module
+
+Keyword sets used in the inner loops of crawling and enrichment (link
+exclusion, service detection, legal form detection), each compiled once into
+a single alternation regex. One scan of a text answers "does any keyword
+occur" or "which keywords occur" instead of one substring test or regex per
+keyword.
+
+Regions can extend the default sets through REGION_KEYWORDS; matchers are
+built on first use and cached per (kind, region).
+
+Author: DSSG Berlin Volunteers
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+# Links whose URL or text contains one of these are not followed
+LINK_EXCLUDE_KEYWORDS = [
+    "datenschutz", "stellen", "job", "beitrit", "struktur", "spenden", 'formular', 'herunterladen', 'sitemap', 'testseite',
+    "veranstaltungen", "sprache", "newsletter", 'news', 'suche', 'agb', 'mailto:', 'tel:', 'fax', 'presse',
+    'transparent', 'vorstand', 'freiwilig', 'download', 'beschwerde', 'facebook', 'feedback', "kontrast", 'praesidium',
+    'barrierefrei', 'instagram', 'twitter', 'youtube', 'linkedin', 'team', 'leitbild', 'leitsätze', 'geschichte',
+    'eingabehilfe', 'warenkorb', 'mitmachen', 'termin', 'aktuell', 'chronik', 'satzung', 'bariere', 'vollzeit', 'teilzeit', 'uploads']
+
+# Headings/list items/paragraphs containing one of these describe a service
+SERVICE_KEYWORDS = [
+    'Beratung', 'Pflege', 'Betreuung', 'Kindergarten', 'Kita',
+    'Seniorenheim', 'Tagespflege', 'Ambulant', 'Stationär',
+    'Jugend', 'Familie', 'Migration', 'Integration'
+]
+
+# Legal forms in order of priority (the first one found in the text wins), case-sensitive
+LEGAL_FORMS = ['e.V.', 'gGmbH', 'GmbH', 'gemeinnützige GmbH', 'Verein']
+
+KEYWORD_SETS = {
+    'link_exclude': (LINK_EXCLUDE_KEYWORDS, True),   # (keywords, ignore case)
+    'services': (SERVICE_KEYWORDS, True),
+    'legal_forms': (LEGAL_FORMS, False),
+}
+
+# Additional keywords per region (keys of PAGE_SITE_CONFIG), e.g.
+# {'Brandenburg': {'link_exclude': ['kalender'], 'services': ['Schuldnerberatung']}}
+REGION_KEYWORDS: Dict[str, Dict[str, List[str]]] = {}
+
+
+class KeywordMatcher:
+    """
+    Substring matching of many keywords with one compiled regex.
+
+    Args:
+        keywords: Keywords in order of priority
+        ignore_case: Match case-insensitively
+    """
+
+    def __init__(self, keywords: Iterable[str], ignore_case: bool = True):
+        self.keywords = list(dict.fromkeys(keywords))
+        self.ignore_case = ignore_case
+        fold = str.lower if ignore_case else (lambda k: k)
+        self._priority = {}
+        for index, keyword in enumerate(self.keywords):
+            self._priority.setdefault(fold(keyword), (index, keyword))
+        self._fold = fold
+        # The regex reports the longest keyword at each position; every other keyword starting
+        # there is a prefix of it, e.g. 'GmbH' of 'GmbH & Co. KG'
+        self._prefixes = {key: [self._priority[other] for other in self._priority if key.startswith(other)]
+                          for key in self._priority}
+        # longest first, so e.g. 'gemeinnützige GmbH' is preferred over 'GmbH' at the same position
+        alternation = "|".join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True))
+        flags = re.IGNORECASE if ignore_case else 0
+        self._search = re.compile(alternation, flags).search if self.keywords else (lambda text: None)
+        # zero-width lookahead finds keywords at every position, also inside other matches
+        self._finditer = re.compile(f"(?=({alternation}))", flags).finditer if self.keywords else None
+
+    def search(self, *texts: str) -> bool:
+        """True if any keyword occurs in any of the texts."""
+        return any(text and self._search(text) for text in texts)
+
+    def find_all(self, text: str) -> List[str]:
+        """All keywords occurring in the text, in order of priority."""
+        if not text or self._finditer is None:
+            return []
+        found = set()
+        for m in self._finditer(text):
+            found.update(self._prefixes[self._fold(m.group(1))])
+        return [keyword for _, keyword in sorted(found)]
+
+    def first(self, text: str) -> Optional[str]:
+        """The keyword with the highest priority that occurs in the text."""
+        found = self.find_all(text)
+        return found[0] if found else None
+
+
+@lru_cache(maxsize=None)
+def get_matcher(kind: str, region: Optional[str] = None) -> KeywordMatcher:
+    """
+    Compiled matcher for a keyword set ('link_exclude', 'services', 'legal_forms').
+
+    Args:
+        kind: Name of the keyword set in KEYWORD_SETS
+        region: Region whose REGION_KEYWORDS are added to the default set
+
+    Returns:
+        Cached KeywordMatcher
+    """
+    keywords, ignore_case = KEYWORD_SETS[kind]
+    extra = REGION_KEYWORDS.get(region, {}).get(kind, []) if region else []
+    return KeywordMatcher(list(keywords) + list(extra), ignore_case=ignore_case)
@@ -0,0 +1,70 @@
+"""
+Parsed Page Module
+
+A page is parsed once and every extractor works on the same parse tree.
+Text, links and tag texts are computed on first use and cached, so running
+all extractors of scraping_utils on a page costs one parse and one
+get_text() instead of one of each per extractor.
+
+The parse uses lxml when it is installed (several times faster than
+html.parser and html5lib) and falls back to Python's html.parser.
+
+Author: DSSG Berlin Volunteers
+"""
+
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple, Union
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401  (only checks that BeautifulSoup can use the lxml parser)
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+
+class ParsedPage:
+    """
+    HTML document parsed once, with cached derived views.
+
+    Args:
+        html_content: HTML content as string
+        url: URL of the page (used to resolve relative links)
+        parser: BeautifulSoup parser, defaults to HTML_PARSER
+    """
+
+    def __init__(self, html_content: str, url: Optional[str] = None, parser: Optional[str] = None):
+        self.html = html_content or ''
+        self.url = url
+        self.parser = parser or HTML_PARSER
+        self._tag_texts: Dict[Tuple[str, ...], List[str]] = {}
+
+    @cached_property
+    def soup(self) -> BeautifulSoup:
+        return BeautifulSoup(self.html, self.parser)
+
+    @cached_property
+    def text(self) -> str:
+        """Text of the whole document (soup.get_text())."""
+        return self.soup.get_text()
+
+    @cached_property
+    def text_lower(self) -> str:
+        return self.text.lower()
+
+    @cached_property
+    def links(self) -> List[Tuple[str, str]]:
+        """(link text, href) of all <a href> elements in document order."""
+        return [(a.get_text(), a['href']) for a in self.soup.find_all('a', href=True)]
+
+    def tag_texts(self, *names: str) -> List[str]:
+        """Stripped texts of all elements with one of the tag names, in document order."""
+        if names not in self._tag_texts:
+            self._tag_texts[names] = [tag.get_text().strip() for tag in self.soup.find_all(list(names))]
+        return self._tag_texts[names]
+
+
+def as_page(page: Union[str, ParsedPage], url: Optional[str] = None) -> ParsedPage:
+    """Accept raw HTML or an already parsed page (extractors take both)."""
+    return page if isinstance(page, ParsedPage) else ParsedPage(page, url)
@@ -0,0 +1,162 @@
+"""
+Rate Limiter Module
+
+Token-bucket rate limiting per host, shared by all threads of a process and,
+through a locked state file, by all processes on the machine. Crawlers and
+the geocoding providers acquire a token before every request, so parallel
+workers together stay within the limits of a service (e.g. Nominatim's
+1 request per second) instead of each worker having its own budget.
+
+The bucket is stored as the time at which it is full again ("theoretical
+arrival time"), so a request costs one read and one write of a float per host.
+Times come from time.monotonic(), which on Linux and Windows is one clock for
+all processes; the state file is discarded after a reboot.
+
+Author: DSSG Berlin Volunteers
+"""
+
+import json
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from crawl_scheduler import host_of
+
+try:
+    import fcntl
+except ImportError:  # Windows: limits are only shared between threads of one process
+    fcntl = None
+
+# Usage policies of services we query (requests per second)
+HOST_RATES = {
+    'nominatim.openstreetmap.org': 1.0,
+}
+
+RATE_LIMIT_CONFIG = {
+    'rate': 1.0,   # default requests per second per host
+    'burst': 1,    # requests allowed at once after a quiet period
+    'state_path': Path(tempfile.gettempdir()) / 'awo_rate_limits.json',  # None: this process only
+}
+
+
+def _boot_time() -> float:
+    """Wall clock time at which the monotonic clock was zero (changes on reboot)."""
+    return time.time() - time.monotonic()
+
+
+class RateLimiter:
+    """
+    Token bucket per host.
+
+    Args:
+        rate: Default requests per second per host
+        burst: Bucket size, number of requests that may start at once
+        host_rates: Requests per second for specific hosts (a per-call rate
+            can lower them, never raise them)
+        state_path: JSON file shared between processes, None keeps the
+            buckets in this process
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 1, host_rates: Optional[Dict[str, float]] = None,
+                 state_path: Optional[Path] = None):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.host_rates = {**HOST_RATES, **(host_rates or {})}
+        self.state_path = Path(state_path) if state_path is not None and fcntl is not None else None
+        self._lock = threading.Lock()
+        self._full_at: Dict[str, float] = {}
+
+    def set_rate(self, host: str, rate: float) -> None:
+        """Set the requests per second of one host (accepts a URL too)."""
+        self.host_rates[host_of(host) if '://' in host else host.lower()] = float(rate)
+
+    def rate_for(self, host: str, rate: Optional[float] = None) -> float:
+        rates = [r for r in (self.host_rates.get(host), rate) if r]
+        return min(rates) if rates else self.rate
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, float]]:
+        """Bucket state, locked for the calling thread (and process, with a state file)."""
+        with self._lock:
+            if self.state_path is None:
+                yield self._full_at
+                return
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.state_path, 'a+', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        saved = json.loads(f.read() or '{}')
+                    except ValueError:
+                        saved = {}
+                    if abs(saved.get('boot', 0.0) - _boot_time()) > 1.0:
+                        saved = {}  # written before a reboot, monotonic times are meaningless
+                    state = saved.get('hosts', {})
+                    yield state
+                    now = time.monotonic()
+                    state = {host: t for host, t in state.items() if t > now}
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps({'boot': _boot_time(), 'hosts': state}))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def reserve(self, url_or_host: str, rate: Optional[float] = None) -> float:
+        """
+        Take a token for the host and return the seconds to wait before the request.
+
+        The token is reserved at once, so concurrent callers queue up behind
+        each other instead of all waking up at the same moment.
+        """
+        host = host_of(url_or_host) if '://' in url_or_host else url_or_host.lower()
+        interval = 1.0 / self.rate_for(host, rate)
+        with self._state() as state:
+            now = time.monotonic()
+            full_at = max(state.get(host, now), now)
+            start = max(now, full_at - (self.burst - 1) * interval)
+            state[host] = full_at + interval
+        return start - now
+
+    def acquire(self, url_or_host: str, rate: Optional[float] = None) -> float:
+        """Block until a request to the host is allowed. Returns the seconds waited."""
+        wait = self.reserve(url_or_host, rate)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    """Limiter shared by the crawlers and geocoding providers (see RATE_LIMIT_CONFIG)."""
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter(rate=RATE_LIMIT_CONFIG['rate'], burst=RATE_LIMIT_CONFIG['burst'],
+                                           state_path=RATE_LIMIT_CONFIG['state_path'])
+        return _default_limiter
+
+
+def throttle(url: str, host_delay: float) -> float:
+    """
+    Wait for a request to the URL's host, at most one per host_delay seconds.
+
+    host_delay <= 0 disables the delay; hosts with a rate of their own
+    (HOST_RATES, a robots.txt Crawl-delay) are still limited to it.
+
+    Returns:
+        Seconds waited
+    """
+    limiter = get_limiter()
+    if host_delay > 0:
+        return limiter.acquire(url, rate=1.0 / host_delay)
+    if host_of(url) in limiter.host_rates:
+        return limiter.acquire(url)
+    return 0.0
@@ -0,0 +1,294 @@
+"""
+Response Cache Module
+
+Persistent on-disk HTTP response cache for the AWO crawlers.
+
+Entries are keyed by the normalized URL (see scraping_utils.normalize). Each
+entry stores status, headers, ETag and Last-Modified in a small JSON file, while
+the body is stored content-addressed (by its SHA-256), so identical pages are
+kept only once. Stale entries are revalidated with If-None-Match /
+If-Modified-Since, so an unchanged page costs one round trip without a body.
+In offline mode the network is never touched and only cached pages are served.
+
+Author: DSSG Berlin Volunteers
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import http_client
+from scraping_utils import normalize
+
+# Default cache configuration
+CACHE_CONFIG = {
+    'cache_dir': './raw_html_text/http_cache',
+    'ttl': 7 * 24 * 3600,             # serve without revalidation for 7 days
+    'max_age': 90 * 24 * 3600,        # evict entries not refreshed for 90 days
+    'max_bytes': 2 * 1024 ** 3,       # evict least recently used beyond 2 GB
+    'offline': False,
+}
+
+# headers that describe the transfer, not the (already decoded) body
+_SKIP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+class OfflineCacheMiss(Exception):
+    """Raised in offline mode when a URL is not in the cache."""
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _build_response(url: str, meta: Dict, body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.url = meta.get('url', url)
+    response.status_code = meta.get('status', 200)
+    response.headers = CaseInsensitiveDict(meta.get('headers', {}))
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = body
+    return response
+
+
+class ResponseCache:
+    """
+    Content-addressed HTTP response cache with conditional revalidation.
+
+    Args:
+        cache_dir: Directory holding the cache
+        ttl: Seconds an entry is served without revalidation
+        max_age: Seconds after which an entry that was not refreshed is evicted
+        max_bytes: Maximum total size of stored bodies
+        offline: Never use the network, serve only from cache
+    """
+
+    def __init__(self, cache_dir=CACHE_CONFIG['cache_dir'], ttl: float = CACHE_CONFIG['ttl'],
+                 max_age: float = CACHE_CONFIG['max_age'], max_bytes: int = CACHE_CONFIG['max_bytes'],
+                 offline: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0}
+        self._lock = threading.Lock()
+
+    # ---- storage layout --------------------------------------------------
+
+    @staticmethod
+    def key(url: str) -> str:
+        """Cache key of a URL (SHA-256 of the normalized URL)."""
+        return hashlib.sha256(normalize(url).encode('utf-8')).hexdigest()
+
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / 'meta' / key[:2] / f"{key}.json"
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.cache_dir / 'blobs' / digest[:2] / digest
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def lookup(self, url: str) -> Optional[Tuple[Dict, bytes]]:
+        """Return (meta, body) of a cached URL or None."""
+        meta_path = self._meta_path(self.key(url))
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            body = self._blob_path(meta['sha256']).read_bytes()
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(meta_path)  # access time for LRU eviction
+        return meta, body
+
+    def store(self, url: str, response: requests.Response) -> Dict:
+        """Store a successful response and return its metadata."""
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not blob_path.exists():
+            _atomic_write(blob_path, body)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS}
+        meta = {
+            'url': response.url or url,
+            'status': response.status_code,
+            'headers': headers,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': digest,
+            'size': len(body),
+            'stored_at': time.time(),
+        }
+        self._write_meta(url, meta)
+        self._count('stored')
+        return meta
+
+    def _write_meta(self, url: str, meta: Dict) -> None:
+        data = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        _atomic_write(self._meta_path(self.key(url)), data)
+
+    # ---- fetching --------------------------------------------------------
+
+    def serves_locally(self, url: str) -> bool:
+        """True if ``get`` will answer this URL without using the network."""
+        if self.offline:
+            return True
+        try:
+            meta = json.loads(self._meta_path(self.key(url)).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return False
+        return time.time() - meta.get('stored_at', 0) < self.ttl
+
+    def get(self, url: str, headers: Dict = None, **kwargs) -> requests.Response:
+        """
+        Fetch a URL through the cache.
+
+        Fresh entries are returned directly, stale entries are revalidated
+        with a conditional request, misses are fetched and stored.
+        The returned response has an extra attribute ``from_cache``.
+
+        Args:
+            url: URL to fetch
+            headers: Request headers
+            **kwargs: Further arguments for http_client.get (e.g. timeout)
+
+        Returns:
+            requests.Response
+
+        Raises:
+            OfflineCacheMiss: In offline mode when the URL is not cached
+        """
+        cached = self.lookup(url)
+        if cached is not None:
+            meta, body = cached
+            if self.offline or time.time() - meta['stored_at'] < self.ttl:
+                self._count('hits')
+                response = _build_response(url, meta, body)
+                response.from_cache = True
+                return response
+        if self.offline:
+            self._count('misses')
+            raise OfflineCacheMiss(f"{url} not in cache (offline mode)")
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            meta, body = cached
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+
+        response = http_client.get(url, headers=request_headers, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            self._count('revalidated')
+            meta['stored_at'] = time.time()
+            self._write_meta(url, meta)
+            response = _build_response(url, meta, body)
+            response.from_cache = True
+            return response
+
+        self._count('misses')
+        if response.status_code == 200:
+            self.store(url, response)
+        response.from_cache = False
+        return response
+
+    # ---- eviction --------------------------------------------------------
+
+    def evict(self) -> Dict[str, int]:
+        """
+        Remove entries older than ``max_age`` and, if the cache is still
+        larger than ``max_bytes``, the least recently used entries.
+        Bodies no longer referenced by any entry are deleted.
+
+        Returns:
+            Dictionary with number of removed entries and blobs
+        """
+        now = time.time()
+        entries = []  # (last access, meta path, sha256, size)
+        removed_entries = 0
+        for meta_path in (self.cache_dir / 'meta').glob('*/*.json'):
+            try:
+                meta = json.loads(meta_path.read_text(encoding='utf-8'))
+                accessed = meta_path.stat().st_mtime
+            except (OSError, ValueError):
+                meta_path.unlink(missing_ok=True)
+                removed_entries += 1
+                continue
+            if now - meta.get('stored_at', 0) > self.max_age:
+                meta_path.unlink(missing_ok=True)
+                removed_entries += 1
+                continue
+            entries.append((accessed, meta_path, meta.get('sha256'), meta.get('size', 0)))
+
+        entries.sort(key=lambda e: e[0], reverse=True)  # most recently used first
+        referenced = set()
+        total = 0
+        for accessed, meta_path, digest, size in entries:
+            if digest not in referenced:
+                if total + size > self.max_bytes:
+                    meta_path.unlink(missing_ok=True)
+                    removed_entries += 1
+                    continue
+                total += size
+            referenced.add(digest)
+
+        removed_blobs = 0
+        for blob_path in (self.cache_dir / 'blobs').glob('*/*'):
+            if blob_path.name not in referenced and not blob_path.name.startswith('.tmp-'):
+                blob_path.unlink(missing_ok=True)
+                removed_blobs += 1
+
+        return {'entries': removed_entries, 'blobs': removed_blobs}
+
+    def format_stats(self) -> str:
+        """One-line summary of cache usage for run reports."""
+        s = self.stats
+        return (f"cache: {s['hits']} hits, {s['revalidated']} revalidated (304), "
+                f"{s['misses']} misses, {s['stored']} stored")
+
+
+_caches: Dict[Tuple, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def open_cache(config: Dict) -> Optional[ResponseCache]:
+    """
+    Return the shared ResponseCache described by a scraping config
+    (keys ``cache_dir``, ``cache_ttl``, ``cache_max_bytes``, ``offline``),
+    or None when ``cache_dir`` is not set.
+    """
+    cache_dir = config.get('cache_dir')
+    if not cache_dir:
+        return None
+    key = (str(Path(cache_dir).resolve()), bool(config.get('offline', False)))
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = ResponseCache(
+                cache_dir,
+                ttl=config.get('cache_ttl', CACHE_CONFIG['ttl']),
+                max_age=config.get('cache_max_age', CACHE_CONFIG['max_age']),
+                max_bytes=config.get('cache_max_bytes', CACHE_CONFIG['max_bytes']),
+                offline=config.get('offline', False),
+            )
+        return _caches[key]
@@ -0,0 +1,180 @@
+"""
+Robots Policy Module
+
+robots.txt handling for the crawlers. The robots.txt of every origin is
+fetched once, parsed with urllib.robotparser and kept for a TTL, so all URLs
+of a host are checked against one cached policy instead of one download per
+check. Rules are evaluated per user-agent group (our AWO-Research-Bot group
+if the file has one, otherwise '*').
+
+A Crawl-delay (or Request-rate) of the matching group lowers the request
+rate of the host in the shared rate limiter, so the fetch scheduler spaces
+requests as the site asks for.
+
+Fetch results follow RFC 9309: a 4xx response (no robots.txt) allows
+everything, a 5xx response or an unreachable host disallows everything until
+the error TTL has passed.
+
+Author: DSSG Berlin Volunteers
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+import http_client
+from rate_limiter import get_limiter
+from response_cache import OfflineCacheMiss
+
+ROBOTS_CONFIG = {
+    'user_agent': 'AWO-Research-Bot/1.0 (Research project; contact@awo.org)',
+    'ttl': 24 * 3600,      # seconds a fetched robots.txt is trusted
+    'error_ttl': 600,      # seconds before an unreachable robots.txt is tried again
+    'timeout': 10,
+    'max_bytes': 500 * 1024,  # RFC 9309: at least 500 KiB must be parsed
+}
+
+
+def _origin(url: str) -> str:
+    parts = urlparse(url if '://' in url else f"https://{url}")
+    return f"{parts.scheme}://{parts.netloc.lower()}"
+
+
+def _policy(lines: List[str] = None, allow_all: bool = False, disallow_all: bool = False) -> RobotFileParser:
+    parser = RobotFileParser()
+    parser.parse(lines or [])  # also marks the parser as read, can_fetch() is False before
+    parser.allow_all = allow_all
+    parser.disallow_all = disallow_all
+    return parser
+
+
+class RobotsCache:
+    """
+    robots.txt policies per origin (scheme and host), fetched on first use.
+
+    Args:
+        user_agent: User agent the rules are evaluated for
+        ttl: Seconds a fetched policy is used before it is fetched again
+        cache: ResponseCache to fetch robots.txt through (optional, needed offline)
+        apply_crawl_delay: Lower the host rate of the shared rate limiter to the Crawl-delay
+    """
+
+    def __init__(self, user_agent: str = ROBOTS_CONFIG['user_agent'], ttl: float = ROBOTS_CONFIG['ttl'],
+                 cache=None, apply_crawl_delay: bool = True):
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.cache = cache
+        self.apply_crawl_delay = apply_crawl_delay
+        self._lock = threading.Lock()
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self._policies: Dict[str, Tuple[RobotFileParser, float]] = {}  # origin -> (policy, expires_at)
+        self.stats = {'fetched': 0, 'hits': 0, 'disallowed': 0}
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _fetch(self, origin: str) -> Tuple[RobotFileParser, float]:
+        """Download and parse the robots.txt of an origin. Returns (policy, ttl)."""
+        robots_url = f"{origin}/robots.txt"
+        headers = {'User-Agent': self.user_agent}
+        try:
+            if self.cache is None or not self.cache.serves_locally(robots_url):
+                get_limiter().acquire(robots_url)
+            get = self.cache.get if self.cache is not None else http_client.get
+            response = get(robots_url, headers=headers, timeout=ROBOTS_CONFIG['timeout'])
+        except OfflineCacheMiss:
+            return _policy(allow_all=True), self.ttl  # offline: pages come from the cache anyway
+        except requests.exceptions.RequestException as e:
+            print(f"Could not fetch {robots_url} ({e}), not crawling {origin} for now")
+            return _policy(disallow_all=True), ROBOTS_CONFIG['error_ttl']
+
+        if response.status_code >= 500:
+            print(f"{robots_url} returned {response.status_code}, not crawling {origin} for now")
+            return _policy(disallow_all=True), ROBOTS_CONFIG['error_ttl']
+        if response.status_code >= 400:
+            return _policy(allow_all=True), self.ttl
+        text = response.content[:ROBOTS_CONFIG['max_bytes']].decode('utf-8', errors='replace')
+        return _policy(text.splitlines()), self.ttl
+
+    def policy(self, url: str) -> RobotFileParser:
+        """Parsed robots.txt of the URL's origin (fetched once per TTL, also across threads)."""
+        origin = _origin(url)
+        cached = self._policies.get(origin)
+        if cached is not None and cached[1] > time.monotonic():
+            self._count('hits')
+            return cached[0]
+        with self._lock:
+            host_lock = self._host_locks.setdefault(origin, threading.Lock())
+        with host_lock:
+            cached = self._policies.get(origin)
+            if cached is not None and cached[1] > time.monotonic():
+                return cached[0]
+            parser, ttl = self._fetch(origin)
+            self._count('fetched')
+            self._policies[origin] = (parser, time.monotonic() + ttl)
+        if self.apply_crawl_delay:
+            self._apply_delay(origin, parser)
+        return parser
+
+    def _apply_delay(self, origin: str, parser: RobotFileParser) -> None:
+        delay = self.crawl_delay(origin, parser)
+        if not delay:
+            return
+        limiter = get_limiter()
+        host = urlparse(origin).netloc
+        if 1.0 / delay < limiter.rate_for(host):
+            limiter.set_rate(host, 1.0 / delay)
+            print(f"  {host}: Crawl-delay {delay:g}s")
+
+    def can_fetch(self, url: str) -> bool:
+        """True if the robots.txt rules allow our user agent to fetch the URL."""
+        allowed = self.policy(url).can_fetch(self.user_agent, url)
+        if not allowed:
+            self._count('disallowed')
+        return allowed
+
+    def crawl_delay(self, url: str, parser: Optional[RobotFileParser] = None) -> Optional[float]:
+        """
+        Seconds to wait between requests to the URL's host, from Crawl-delay or Request-rate.
+
+        Args:
+            url: Any URL of the host
+            parser: Policy to read instead of the cached one
+
+        Returns:
+            Delay in seconds, None if the robots.txt sets none
+        """
+        parser = parser or self.policy(url)
+        delay = parser.crawl_delay(self.user_agent)
+        rate = parser.request_rate(self.user_agent)
+        delays = [float(delay)] if delay else []
+        if rate and rate.requests:
+            delays.append(rate.seconds / rate.requests)
+        return max(delays) if delays else None
+
+    def sitemaps(self, url: str) -> List[str]:
+        """Sitemap URLs listed in the robots.txt of the URL's origin."""
+        return list(dict.fromkeys(self.policy(url).site_maps() or []))
+
+    def format_stats(self) -> str:
+        with self._lock:
+            s = dict(self.stats)
+        return f"robots.txt: {s['fetched']} fetched, {s['hits']} cached checks, {s['disallowed']} URLs disallowed"
+
+
+_default_robots = None
+_default_robots_lock = threading.Lock()
+
+
+def get_robots_cache() -> RobotsCache:
+    """Robots policies shared by all fetchers of the process (see ROBOTS_CONFIG)."""
+    global _default_robots
+    with _default_robots_lock:
+        if _default_robots is None:
+            _default_robots = RobotsCache()
+        return _default_robots
@@ -10,24 +10,51 @@ Author: DSSG Berlin Volunteers
 import re
 import time
 from pathlib import Path
-from random import uniform
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from urllib.parse import urljoin, urlparse
 
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
+
+import http_client
+from rate_limiter import throttle
+from parsed_page import ParsedPage, as_page
+from keyword_matcher import get_matcher
 
 # Default scraping configuration
 DEFAULT_CONFIG = {
     'user_agent': 'AWO-Research-Bot/1.0 (Research project; contact@awo.org)',
-    'delay_min': 1.0,
-    'delay_max': 3.0,
+    'host_delay': 1.0,  # min. seconds between two requests to the same host, 0: no delay
     'timeout': 10,
     'max_retries': 3,
 }
 
 
+def host_delay_of(config: Dict) -> float:
+    """
+    Minimum seconds between two requests to a host for a scraping config.
+
+    Configs written before host_delay (a random pause between delay_min and
+    delay_max) map to delay_min, the pause they guaranteed.
+
+    Args:
+        config: Scraping configuration dictionary
+
+    Returns:
+        host_delay in seconds (0 or less: no delay)
+    """
+    if 'host_delay' in config:
+        return config['host_delay']
+    if 'delay_min' in config or 'delay_max' in config:
+        return config.get('delay_min', config.get('delay_max'))
+    return DEFAULT_CONFIG['host_delay']
+
+
+def normalize(url: str) -> str:
+    """Normalize URL for consistent comparison."""
+    return url.strip().rstrip('/')
+
+
 def fetch_webpage(url: str, config: Dict = None) -> Tuple[bool, str, Optional[str], Optional[str]]:
     """
     Fetch a webpage with proper error handling and rate limiting.
@@ -47,9 +74,9 @@ def fetch_webpage(url: str, config: Dict = None) -> Tuple[bool, str, Optional[st
     for attempt in range(config['max_retries']):
         try:
             # Rate limiting
-            time.sleep(uniform(config['delay_min'], config['delay_max']))
+            throttle(url, host_delay_of(config))
 
-            response = requests.get(url, headers=headers, timeout=config['timeout'])
+            response = http_client.get(url, headers=headers, timeout=config['timeout'])
             response.raise_for_status()
 
             return True, url, response.text, None
@@ -57,24 +84,24 @@ def fetch_webpage(url: str, config: Dict = None) -> Tuple[bool, str, Optional[st
         except requests.exceptions.RequestException as e:
             error_msg = f"Attempt {attempt + 1}/{config['max_retries']} failed: {str(e)}"
             if attempt == config['max_retries'] - 1:
-                return False, None, error_msg
+                return False, url, None, error_msg
             # Exponential backoff
             time.sleep(2 ** attempt)
 
     return False, url, None, "Max retries exceeded"
 
 
-def extract_contact_info(html_content: str) -> Dict[str, List[str]]:
+def extract_contact_info(html_content: Union[str, ParsedPage]) -> Dict[str, List[str]]:
     """
     Extract contact information from HTML content.
 
     Args:
-        html_content: HTML content as string
+        html_content: HTML content as string or ParsedPage
 
     Returns:
         Dictionary with extracted contact information
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    page = as_page(html_content)
 
     contact_info = {
         'emails': [],
@@ -83,7 +110,7 @@ def extract_contact_info(html_content: str) -> Dict[str, List[str]]:
         'social_media': []
     }
 
-    text = soup.get_text()
+    text = page.text
 
     # Extract emails
     email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
@@ -111,17 +138,17 @@ def extract_contact_info(html_content: str) -> Dict[str, List[str]]:
     return contact_info
 
 
-def extract_opening_hours(html_content: str) -> List[str]:
+def extract_opening_hours(html_content: Union[str, ParsedPage]) -> List[str]:
     """
     Extract opening hours from HTML content.
 
     Args:
-        html_content: HTML content as string
+        html_content: HTML content as string or ParsedPage
 
     Returns:
         List of opening hours strings
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    page = as_page(html_content)
     opening_hours = []
 
     # Common German patterns for opening hours
@@ -130,7 +157,7 @@ def extract_opening_hours(html_content: str) -> List[str]:
         r'(?:Mo|Di|Mi|Do|Fr|Sa|So)(?:\.|\s)*(?:\-|bis)(?:\s)*(?:Mo|Di|Mi|Do|Fr|Sa|So)(?:\.|\s)*\d{1,2}:\d{2}',
     ]
 
-    text = soup.get_text()
+    text = page.text
 
     for pattern in patterns:
         matches = re.findall(pattern, text, re.IGNORECASE)
@@ -139,71 +166,67 @@ def extract_opening_hours(html_content: str) -> List[str]:
     return opening_hours
 
 
-def extract_services(html_content: str) -> List[str]:
+def extract_services(html_content: Union[str, ParsedPage], region: Optional[str] = None) -> List[str]:
     """
     Extract service descriptions from HTML content.
 
     Args:
-        html_content: HTML content as string
+        html_content: HTML content as string or ParsedPage
+        region: Region whose extra service keywords are used (keyword_matcher.REGION_KEYWORDS)
 
     Returns:
         List of service descriptions
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    page = as_page(html_content)
     services = []
 
-    # Look for common service-related keywords
-    service_keywords = [
-        'Beratung', 'Pflege', 'Betreuung', 'Kindergarten', 'Kita',
-        'Seniorenheim', 'Tagespflege', 'Ambulant', 'Stationär',
-        'Jugend', 'Familie', 'Migration', 'Integration'
-    ]
+    # Look for common service-related keywords (keyword_matcher.SERVICE_KEYWORDS)
+    service_keywords = get_matcher('services', region)
 
     # Search in headings and list items
-    for tag in soup.find_all(['h2', 'h3', 'h4', 'li', 'p']):
-        text = tag.get_text().strip()
-        if any(keyword.lower() in text.lower() for keyword in service_keywords):
+    for text in page.tag_texts('h2', 'h3', 'h4', 'li', 'p'):
+        if service_keywords.search(text):
             services.append(text)
+            if len(services) == 10:
+                break
 
     return services[:10]  # Limit to top 10
 
 
-def check_robots_txt(domain: str) -> Tuple[bool, str]:
+def check_robots_txt(domain: str, path: str = '/') -> Tuple[bool, str]:
     """
     Check if scraping is allowed according to robots.txt.
 
+    The robots.txt is fetched once per domain and cached (see robots_policy.py);
+    rules are evaluated for the AWO-Research-Bot user agent.
+
     Args:
         domain: Domain to check
+        path: Path on the domain to check
 
     Returns:
         Tuple of (allowed: bool, message: str)
     """
-    robots_url = f"https://{domain}/robots.txt"
-
-    try:
-        response = requests.get(robots_url, timeout=5)
-        if response.status_code == 200:
-            # Basic check - you might want to use robotparser for more thorough checking
-            if 'Disallow: /' in response.text:
-                return False, "Scraping disallowed by robots.txt"
-            return True, "Scraping allowed"
-        else:
-            return True, "No robots.txt found (allowed by default)"
-    except:
-        return True, "Could not check robots.txt (proceeding with caution)"
+    from robots_policy import get_robots_cache  # not at module level: response_cache imports this module
+    robots = get_robots_cache()
+    if robots.can_fetch(urljoin(f"https://{domain}/", path)):
+        delay = robots.crawl_delay(domain)
+        return True, "Scraping allowed" + (f" (Crawl-delay {delay:g}s)" if delay else "")
+    return False, "Scraping disallowed by robots.txt"
 
 
-def extract_impressum_data(html_content: str) -> Dict[str, str]:
+def extract_impressum_data(html_content: Union[str, ParsedPage], region: Optional[str] = None) -> Dict[str, str]:
     """
     Extract data from Impressum (legal notice) page.
 
     Args:
-        html_content: HTML content of impressum page
+        html_content: HTML content of impressum page (string or ParsedPage)
+        region: Region whose extra legal forms are used (keyword_matcher.REGION_KEYWORDS)
 
     Returns:
         Dictionary with extracted impressum data
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    page = as_page(html_content)
 
     impressum_data = {
         'organization': None,
@@ -212,14 +235,10 @@ def extract_impressum_data(html_content: str) -> Dict[str, str]:
         'registration': None
     }
 
-    text = soup.get_text()
+    text = page.text
 
-    # Extract legal form
-    legal_forms = ['e.V.', 'gGmbH', 'GmbH', 'gemeinnützige GmbH', 'Verein']
-    for form in legal_forms:
-        if form in text:
-            impressum_data['legal_form'] = form
-            break
+    # Extract legal form (first of keyword_matcher.LEGAL_FORMS in priority order)
+    impressum_data['legal_form'] = get_matcher('legal_forms', region).first(text)
 
     # Extract registration number
     reg_pattern = r'(?:Registernummer|Vereinsregister|Handelsregister)[\s:]*([A-Z0-9\s]+)'
@@ -250,6 +269,8 @@ def scrape_domain_batch(domains: List[str],
     if max_domains:
         domains = domains[:max_domains]
 
+    from robots_policy import get_robots_cache  # not at module level: response_cache imports this module
+    robots = get_robots_cache()
     results = []
     total = len(domains)
 
@@ -257,7 +278,10 @@ def scrape_domain_batch(domains: List[str],
         print(f"[{idx}/{total}] Scraping {domain}...")
 
         url = f"https://{domain}"
-        success, content, error = fetch_webpage(url, config)
+        if robots.can_fetch(url):
+            success, _, content, error = fetch_webpage(url, config)
+        else:
+            success, content, error = False, None, "Disallowed by robots.txt"
 
         result = {
             'domain': domain,
@@ -278,39 +302,63 @@ def scrape_domain_batch(domains: List[str],
 
         results.append(result)
 
+    print(f"Connections: {http_client.format_stats()}")
     return pd.DataFrame(results)
 
 
-def find_impressum_link(html_content: str, base_url: str) -> Optional[str]:
+def find_impressum_link(html_content: Union[str, ParsedPage], base_url: str) -> Optional[str]:
     """
     Find the link to the Impressum page.
 
     Args:
-        html_content: HTML content of the page
+        html_content: HTML content of the page (string or ParsedPage)
         base_url: Base URL of the website
 
     Returns:
         URL to impressum page or None
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    page = as_page(html_content)
 
     # Common patterns for impressum links
     impressum_patterns = [
         'impressum', 'imprint', 'legal notice', 'rechtliches'
     ]
 
-    for link in soup.find_all('a', href=True):
-        link_text = link.get_text().lower()
-        link_href = link['href'].lower()
+    for text, href in page.links:
+        link_text = text.lower()
+        link_href = href.lower()
 
         if any(pattern in link_text or pattern in link_href for pattern in impressum_patterns):
             # Make absolute URL
-            full_url = urljoin(base_url, link['href'])
+            full_url = urljoin(base_url, href)
             return full_url
 
     return None
 
 
+def extract_all(html_content: Union[str, ParsedPage], base_url: Optional[str] = None,
+                region: Optional[str] = None) -> Dict:
+    """
+    Run all extractors on one page, parsing it only once.
+
+    Args:
+        html_content: HTML content as string or ParsedPage
+        base_url: Base URL of the page (for the impressum link)
+        region: Region for region-specific keyword sets
+
+    Returns:
+        Dictionary with contact_info, opening_hours, services, impressum and impressum_link
+    """
+    page = as_page(html_content, base_url)
+    return {
+        'contact_info': extract_contact_info(page),
+        'opening_hours': extract_opening_hours(page),
+        'services': extract_services(page, region),
+        'impressum': extract_impressum_data(page, region),
+        'impressum_link': find_impressum_link(page, base_url) if base_url else None,
+    }
+
+
 def validate_extracted_data(data: Dict) -> Dict[str, bool]:
     """
     Validate extracted data quality.
@@ -368,5 +416,6 @@ if __name__ == "__main__":
     print("  - extract_impressum_data()")
     print("  - scrape_domain_batch()")
     print("  - find_impressum_link()")
+    print("  - extract_all()")
     print("  - validate_extracted_data()")
     print("  - export_scraping_report()")
@@ -0,0 +1,214 @@
+"""
+Sitemap Reader Module
+
+Streams XML sitemaps (sitemaps.org protocol) without loading them into a
+parse tree. Each sitemap is parsed with ElementTree.iterparse straight from
+the response body; every <url> element is yielded as soon as it is complete
+and then dropped, so memory stays constant for sitemaps of any size.
+
+Sitemap indexes are followed recursively, gzip-compressed sitemaps
+(.xml.gz) are decompressed on the fly and sitemaps of a site can be
+discovered from the Sitemap: lines of its robots.txt. The <lastmod> of every
+entry is exposed, so callers can skip unchanged URLs before fetching them.
+
+Author: DSSG Berlin Volunteers
+"""
+
+import gzip
+import io
+import xml.etree.ElementTree as ET
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+import http_client
+from rate_limiter import get_limiter
+from response_cache import OfflineCacheMiss
+from robots_policy import RobotsCache, get_robots_cache
+
+SITEMAP_CONFIG = {
+    'timeout': 20,
+    'max_depth': 3,        # levels of nested sitemap indexes that are followed
+    'max_sitemaps': 500,   # sitemap files read per call
+    'buffer_size': 64 * 1024,
+}
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+# errors of a single sitemap file that are logged (or raised with raise_errors) instead of aborting the crawl
+SITEMAP_ERRORS = (requests.exceptions.RequestException, OfflineCacheMiss, ET.ParseError, OSError, EOFError)
+
+
+class SitemapEntry(NamedTuple):
+    """A <url> of a sitemap."""
+    loc: str
+    lastmod: Optional[datetime]  # timezone-aware, None if missing or unparsable
+    sitemap: str                 # sitemap file the entry was read from
+
+
+def is_sitemap_url(url: str) -> bool:
+    """True for URLs of XML sitemaps (.xml or .xml.gz)."""
+    path = urlparse(url).path.lower()
+    return path.endswith(('.xml', '.xml.gz'))
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a W3C datetime as used in <lastmod> (YYYY, YYYY-MM, YYYY-MM-DD or a full timestamp).
+
+    Args:
+        value: Text of the <lastmod> element
+
+    Returns:
+        Timezone-aware datetime (UTC if the value has no offset) or None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if len(value) == 4:
+        value += '-01-01'
+    elif len(value) == 7:
+        value += '-01'
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _local(tag: str) -> str:
+    """Tag name without XML namespace."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _open(url: str, headers: Optional[Dict], timeout: float, stack: ExitStack, cache=None) -> io.BufferedIOBase:
+    """
+    Binary stream of the (decompressed) sitemap body.
+    The response and all stream layers are closed with stack (GzipFile does not close its fileobj).
+    """
+    if cache is not None:
+        # cached bodies are stored whole anyway, read them from memory
+        if not cache.serves_locally(url):
+            get_limiter().acquire(url)
+        response = cache.get(url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        stream = stack.enter_context(io.BufferedReader(io.BytesIO(response.content)))
+    else:
+        get_limiter().acquire(url)
+        response = stack.enter_context(http_client.get(url, headers=headers, timeout=timeout, stream=True))
+        response.raise_for_status()
+        response.raw.decode_content = True  # undo Content-Encoding: gzip/deflate
+        response.raw.auto_close = False  # urllib3 closes drained bodies, the BufferedReader would then fail on read()
+        stream = stack.enter_context(io.BufferedReader(response.raw, SITEMAP_CONFIG['buffer_size']))
+    # .xml.gz files are usually served as application/gzip without Content-Encoding
+    if stream.peek(2)[:2] == _GZIP_MAGIC:
+        return stack.enter_context(gzip.GzipFile(fileobj=stream))
+    return stream
+
+
+def _parse(stream, sitemap: str, children: List[SitemapEntry]) -> Iterator[SitemapEntry]:
+    """Yield the <url> entries of one sitemap file; <sitemap> children of an index go to children."""
+    root = None
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if root is None:
+            root = elem
+            continue
+        if event != 'end':
+            continue
+        name = _local(elem.tag)
+        if name not in ('url', 'sitemap'):
+            continue
+        fields = {_local(child.tag): (child.text or '').strip() for child in elem}
+        loc = fields.get('loc')
+        if loc:
+            entry = SitemapEntry(urljoin(sitemap, loc), parse_lastmod(fields.get('lastmod')), sitemap)
+            if name == 'url':
+                yield entry
+            else:
+                children.append(entry)
+        root.clear()  # drop finished elements, the tree never grows beyond one entry
+
+
+def iter_sitemap(url: str, since: Optional[datetime] = None, headers: Optional[Dict] = None,
+                 cache=None, max_depth: int = SITEMAP_CONFIG['max_depth'], raise_errors: bool = False,
+                 _seen: Optional[Set[str]] = None) -> Iterator[SitemapEntry]:
+    """
+    Stream all URL entries of a sitemap, following sitemap indexes.
+
+    Args:
+        url: URL of a sitemap or sitemap index (.xml or .xml.gz)
+        since: Skip entries (and indexed sitemaps) whose lastmod is not after this time;
+               entries without lastmod are always returned
+        headers: Request headers
+        cache: ResponseCache to fetch through (optional)
+        max_depth: Levels of nested sitemap indexes to follow
+        raise_errors: Raise the error if this sitemap cannot be read (one of SITEMAP_ERRORS);
+                      errors of indexed sitemaps are always only logged
+
+    Returns:
+        Iterator over SitemapEntry, in document order
+    """
+    seen = set() if _seen is None else _seen
+    if url in seen or len(seen) >= SITEMAP_CONFIG['max_sitemaps']:
+        return
+    seen.add(url)
+    if since is not None and since.tzinfo is None:
+        since = since.astimezone()
+
+    children: List[SitemapEntry] = []
+    try:
+        with ExitStack() as stack:
+            stream = _open(url, headers, SITEMAP_CONFIG['timeout'], stack, cache)
+            for entry in _parse(stream, url, children):
+                if since is None or entry.lastmod is None or entry.lastmod > since:
+                    yield entry
+    except SITEMAP_ERRORS as e:
+        print(f"Error reading sitemap {url}: {e}")
+        if raise_errors:
+            raise
+
+    if children and max_depth <= 0:
+        print(f"Not following {len(children)} sitemaps of {url} (max_depth reached)")
+        return
+    for child in children:
+        if since is not None and child.lastmod is not None and child.lastmod <= since:
+            continue  # nothing in this sitemap changed
+        yield from iter_sitemap(child.loc, since, headers, cache, max_depth - 1, _seen=seen)
+
+
+def sitemaps_from_robots(site: str, robots: Optional[RobotsCache] = None) -> List[str]:
+    """
+    Sitemap URLs listed in the robots.txt of a site.
+
+    Args:
+        site: Any URL of the site
+        robots: Robots policy cache to read the robots.txt from (default: the shared one)
+
+    Returns:
+        List of sitemap URLs (empty if there is no robots.txt)
+    """
+    return (robots or get_robots_cache()).sitemaps(site)
+
+
+def discover_sitemaps(site: str, robots: Optional[RobotsCache] = None) -> List[str]:
+    """Sitemaps of a site from robots.txt, falling back to /sitemap.xml."""
+    parts = urlparse(site)
+    return (sitemaps_from_robots(site, robots)
+            or [f"{parts.scheme or 'https'}://{parts.netloc}/sitemap.xml"])
+
+
+def iter_site_urls(site: str, since: Optional[datetime] = None, headers: Optional[Dict] = None,
+                   cache=None, robots: Optional[RobotsCache] = None) -> Iterator[SitemapEntry]:
+    """All sitemap entries of a site (each URL once), starting from its discovered sitemaps."""
+    seen_sitemaps: Set[str] = set()
+    seen_urls: Set[str] = set()
+    for sitemap in discover_sitemaps(site, robots):
+        for entry in iter_sitemap(sitemap, since, headers, cache, _seen=seen_sitemaps):
+            if entry.loc not in seen_urls:
+                seen_urls.add(entry.loc)
+                yield entry
@@ -0,0 +1,29 @@
+from keyword_matcher import KeywordMatcher, get_matcher
+
+
+def test_first_prefers_priority_over_longer_keyword_at_same_position():
+    matcher = KeywordMatcher(['GmbH', 'GmbH & Co. KG'], ignore_case=False)
+
+    assert matcher.first('Muster GmbH & Co. KG') == 'GmbH'
+    assert matcher.find_all('Muster GmbH & Co. KG') == ['GmbH', 'GmbH & Co. KG']
+
+
+def test_find_all_reports_keywords_inside_other_matches():
+    matcher = KeywordMatcher(['Beratung', 'Schuldnerberatung'])
+
+    assert matcher.find_all('Schuldnerberatung und Pflege') == ['Beratung', 'Schuldnerberatung']
+
+
+def test_legal_forms_keep_priority_order():
+    legal_forms = get_matcher('legal_forms')
+
+    assert legal_forms.first('AWO Kreisverband gemeinnützige GmbH, Verein') == 'GmbH'
+    assert legal_forms.first('Träger ist der Verein AWO e.V.') == 'e.V.'
+    assert legal_forms.first('ohne Rechtsform') is None
+
+
+def test_search_ignores_case_for_link_exclusion():
+    excluded = get_matcher('link_exclude')
+
+    assert excluded.search('https://awo.de/DATENSCHUTZ')
+    assert not excluded.search('https://awo.de/kita-sonnenschein', '')
@@ -1,56 +1,60 @@
 import requests
-import json
-import time
+import os
+import sys
 from pathlib import Path
 
-# Simplified cache handling
-def load_cache(cache_path):
-    if cache_path.exists():
-        try:
-            return json.loads(cache_path.read_text(encoding="utf-8"))
-        except Exception:
-            return {}
-    return {}
+# shared HTTP client (connection pooling/keep-alive) lives next to the crawlers
+sys.path.append(str(Path(__file__).resolve().parent.parent / "crawling_scripts"))
+import http_client
+from rate_limiter import get_limiter
+from geocode_cache import GeocodeCache
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org"
+
+
+def nominatim_url(path: str = "") -> str:
+    """Nominatim base URL (NOMINATIM_URL environment variable overrides it, e.g. for fake_osm_server)."""
+    return os.environ.get("NOMINATIM_URL", NOMINATIM_URL).rstrip("/") + path
 
-def save_cache(cache, cache_path):
-    cache_path.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8")
 
 # Simplified Nominatim provider
 class NominatimProvider:
     def __init__(self, base_url, rate_limit):
         self.base_url = base_url
         self.rate_limit = rate_limit
-        self._last_call = 0.0
+        # shared with other threads/processes querying the same host
+        self._limiter = get_limiter()
 
     def _throttle(self):
-        elapsed = time.time() - self._last_call
-        wait = max(0.0, 1.0 / self.rate_limit - elapsed)
-        if wait > 0:
-            time.sleep(wait)
-        self._last_call = time.time()
+        self._limiter.acquire(self.base_url, rate=self.rate_limit)
 
     def search(self, query):
+        """query is free text or a dict of structured fields (street, city, postalcode, ...)."""
         self._throttle()
         params = {
-            "q": query,
             "format": "jsonv2",
             "limit": 1,
             "countrycodes": "de",
         }
-        response = requests.get(self.base_url, params=params, timeout=30)
-        if response.status_code == 200:
-            return response.json()
-        return []
+        if isinstance(query, dict):
+            params.update(query)
+        else:
+            params["q"] = query
+        response = http_client.get(self.base_url, params=params, timeout=30)
+        response.raise_for_status()  # 429/5xx are errors, not "nothing found" (must not be cached)
+        return response.json()
 
 # Main function
 def main():
     # Configuration
-    base_url = "https://nominatim.openstreetmap.org/search"
+    base_url = nominatim_url("/search")
     rate_limit = 1  # 1 request per second
-    cache_path = Path("cache_results.json")
+    cache_path = Path("cache_results.sqlite")
+    negative_ttl = 7 * 24 * 3600  # look up entities without result again after a week
 
-    # Load cache
-    cache = load_cache(cache_path)
+    # Open cache (entries of the old JSON cache are taken over once)
+    cache = GeocodeCache(cache_path, negative_ttl=negative_ttl)
+    cache.import_json(Path("cache_results.json"))
 
     # Initialize provider
     provider = NominatimProvider(base_url, rate_limit)
@@ -63,11 +67,16 @@ def main():
     for entity in entities:
         if entity in cache:
             print(f"Cache hit for: {entity}")
-            results.append(cache[entity])
+            results.append(cache.get(entity))
             continue
 
         print(f"Resolving: {entity}")
-        result = provider.search(entity)
+        try:
+            result = provider.search(entity)
+        except requests.exceptions.RequestException as e:
+            print(f"Error for {entity}: {e}")  # not cached, retried next run
+            results.append(None)
+            continue
         if result:
             cache[entity] = result[0]  # Cache the first result
             results.append(result[0])
@@ -75,12 +84,14 @@ def main():
             cache[entity] = None
             results.append(None)
 
-    # Save cache
-    save_cache(cache, cache_path)
+    # Every result is written to the cache as soon as it is resolved
+    print(f"Cache: {cache.format_stats()}")
+    cache.close()
 
     # Print results
     for entity, result in zip(entities, results):
         print(f"Entity: {entity}, Result: {result}")
+    print(f"Connections: {http_client.format_stats()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
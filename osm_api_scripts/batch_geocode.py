@@ -0,0 +1,163 @@
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "crawling_scripts"))
+import http_client
+from jsonl_store import JsonlWriter
+from awo1410_minimal import NominatimProvider, nominatim_url
+from geocode_cache import GeocodeCache
+
+# Batch forward geocoding of a whole entity list (e.g. the facilities sheet of the
+# Einrichtungsdatenbank export) with Nominatim.
+# Rows are turned into structured queries (street/postalcode/city) where an address is
+# available, with the free-text "name, city" as fallback. Queries are normalized and
+# deduplicated first, so every distinct address is sent once; results come from the
+# shared GeocodeCache when known. Every row is written to a JSONL file as soon as its
+# query is resolved, with progress, throughput and cache hits printed along the way.
+
+# column names of the Einrichtungsdatenbank export
+ENTITY_COLUMNS = {
+    "name": "name",
+    "street": "adresse_strasse",
+    "postalcode": "adresse_plz",
+    "city": "adresse_ort",
+}
+
+RESULT_FIELDS = ["lat", "lon", "display_name", "osm_type", "osm_id", "category", "type", "importance"]
+
+
+def load_entities(path, sheet_name="Facilities") -> pd.DataFrame:
+    """Read the entity list from a .csv or Excel file."""
+    path = Path(path)
+    if path.suffix.lower() in (".xlsx", ".xls"):
+        return pd.read_excel(path, sheet_name=sheet_name, dtype=str)
+    return pd.read_csv(path, dtype=str)
+
+
+def _clean(value) -> str:
+    if value is None or pd.isna(value):
+        return ""
+    return re.sub(r"\s+", " ", str(value)).strip()
+
+
+def _postcode(value) -> str:
+    # postcodes lose their leading zero when the export is read as numbers (01234 -> 1234.0)
+    value = _clean(value)
+    if re.fullmatch(r"\d{4,5}(\.0)?", value):
+        return value.split(".")[0].zfill(5)
+    return value
+
+
+def build_queries(row, columns: dict = ENTITY_COLUMNS) -> list:
+    """Queries for one entity, best first: structured address, then "name, city" free text."""
+    street = _clean(row.get(columns["street"]))
+    postalcode = _postcode(row.get(columns["postalcode"]))
+    city = _clean(row.get(columns["city"]))
+    name = _clean(row.get(columns["name"]))
+    queries = []
+    if street and (postalcode or city):
+        structured = {"street": street, "postalcode": postalcode, "city": city}
+        queries.append({k: v for k, v in structured.items() if v})
+    if name:
+        queries.append(", ".join(part for part in (name, city) if part))
+    return queries
+
+
+def query_key(query) -> str:
+    """Normalized cache key: case, whitespace and field order do not matter."""
+    if isinstance(query, dict):
+        text = "|".join(f"{k}={query[k]}" for k in sorted(query))
+        return "structured:" + re.sub(r"\s+", " ", text.lower())
+    return "q:" + re.sub(r"\s+", " ", query.lower()).strip()
+
+
+class _Stats:
+    def __init__(self, total: int):
+        self.total = total
+        self.rows = 0
+        self.found = 0
+        self.requests = 0
+        self.cache_hits = 0
+        self.started = time.monotonic()
+
+    def __str__(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (f"{self.rows}/{self.total} rows, {self.found} found, "
+                f"{self.requests} requests, {self.cache_hits} cache hits, "
+                f"{self.rows / elapsed:.1f} rows/s")
+
+
+def _resolve(query, cache: GeocodeCache, provider: NominatimProvider, stats: _Stats):
+    key = query_key(query)
+    if key in cache:
+        stats.cache_hits += 1
+        return cache.get(key)
+    stats.requests += 1
+    try:
+        found = provider.search(query)
+    except Exception as e:
+        print(f"Error for {query}: {e}")
+        return None  # not cached, retried next run
+    result = found[0] if found else None
+    cache[key] = result
+    return result
+
+
+def geocode_entities(entities: pd.DataFrame, output_file, columns: dict = ENTITY_COLUMNS,
+                     cache_path: Path = Path("cache_results.sqlite"), provider: NominatimProvider = None,
+                     negative_ttl: float = 7 * 24 * 3600, progress_every: int = 100) -> _Stats:
+    """Forward geocode all rows of entities and stream one JSON record per row to output_file.
+    Rows with the same query (after normalization) are resolved once. Returns the run statistics."""
+    provider = provider or NominatimProvider(nominatim_url("/search"), rate_limit=1)
+    cache = GeocodeCache(cache_path, negative_ttl=negative_ttl)
+
+    # group rows by their queries so each distinct query is resolved once
+    groups = {}
+    for index, row in entities.iterrows():
+        queries = build_queries(row, columns)
+        groups.setdefault(tuple(query_key(q) for q in queries), (queries, []))[1].append((index, row))
+    stats = _Stats(len(entities))
+    print(f"{len(entities)} rows, {len(groups)} distinct queries")
+
+    Path(output_file).unlink(missing_ok=True)  # JsonlWriter appends, every run writes a fresh file
+    with JsonlWriter(output_file) as writer:
+        for queries, rows in groups.values():
+            result, used = None, None
+            for query in queries:
+                result = _resolve(query, cache, provider, stats)
+                if result:
+                    used = query
+                    break
+            for index, row in rows:
+                record = {"row": index.item() if hasattr(index, "item") else index,
+                          "name": _clean(row.get(columns["name"])),
+                          "query": used if used is not None else (queries[0] if queries else None),
+                          "found": result is not None}
+                record.update({field: (result or {}).get(field) for field in RESULT_FIELDS})
+                writer.write(record)
+                stats.rows += 1
+                stats.found += result is not None
+                if stats.rows % progress_every == 0:
+                    print(f"  {stats}")
+
+    print(f"Done: {stats}")
+    print(f"Cache: {cache.format_stats()}")
+    print(f"Connections: {http_client.format_stats()}")
+    cache.close()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forward geocode an entity list with Nominatim")
+    parser.add_argument("input", help="CSV or Excel file with the entities")
+    parser.add_argument("--sheet", default="Facilities", help="Excel sheet to read")
+    parser.add_argument("--output", default="geocoded_entities.jsonl",
+                        help="JSONL output file (.gz/.zst for compression)")
+    args = parser.parse_args()
+
+    geocode_entities(load_entities(args.input, args.sheet), args.output)
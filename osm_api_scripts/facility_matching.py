@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+from text_normalization import normalize_names
+
+# Fuzzy matching of facility names between the Einrichtungsdatenbank export and OSM results.
+# Instead of one process.extractOne call per row, candidates are blocked by postcode prefix
+# (rows without postcode are compared with all rows of the other side) and every block is
+# scored at once with process.cdist on all cores. Identical names are scored only once.
+
+DEFAULT_SCORER = fuzz.token_sort_ratio
+
+
+def postcode_block(postcodes: pd.Series, prefix: int = 2) -> pd.Series:
+    """Blocking key: the first prefix digits of the (zero padded) postcode, NaN if there is none."""
+    digits = postcodes.astype("string").str.extract(r"(\d{4,5})", expand=False).str.zfill(5)
+    return digits.str[:prefix]
+
+
+def _score_block(query: pd.Series, choices: pd.Series, k: int, threshold: float, scorer) -> list:
+    """Top-k matches of every query name among the choice names of one block.
+    Returns (query index, rank, match name, score, choice index) tuples."""
+    query_names = query.unique()
+    choice_names = choices.unique()
+    if len(query_names) == 0 or len(choice_names) == 0:
+        return []
+    scores = process.cdist(query_names, choice_names, scorer=scorer, score_cutoff=threshold,
+                           dtype=np.uint8, workers=-1)
+    k = min(k, len(choice_names))
+    top = np.argpartition(scores, -k, axis=1)[:, -k:]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores.astype(np.int16), axis=1, kind="stable")
+    top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    first_index = pd.Series(choices.index, index=choices.values)
+    first_index = first_index[~first_index.index.duplicated()]
+    matches_of = {}
+    for name, columns, values in zip(query_names, top, top_scores):
+        matches_of[name] = [(rank, choice_names[c], int(s), first_index[choice_names[c]])
+                            for rank, (c, s) in enumerate(zip(columns, values), 1)
+                            if s >= threshold and s > 0]
+    return [(index, rank, match, score, choice_index)
+            for index, name in query.items() for rank, match, score, choice_index in matches_of[name]]
+
+
+def top_matches(query: pd.Series, choices: pd.Series, query_block: pd.Series = None,
+                choice_block: pd.Series = None, k: int = 3, threshold: float = 85,
+                scorer=DEFAULT_SCORER) -> pd.DataFrame:
+    """Top-k fuzzy matches of the (normalized) names in query among choices.
+
+    With blocking keys (e.g. postcode_block) only names of the same block are compared;
+    query rows without key are compared with all choices, choices without key with all queries.
+    Returns one row per match: query_index, rank, match, score, choice_index."""
+    query = query[query.notna() & query.astype(str).str.strip().ne("")]
+    choices = choices[choices.notna() & choices.astype(str).str.strip().ne("")]
+    rows = []
+    if query_block is None or choice_block is None:
+        rows = _score_block(query, choices, k, threshold, scorer)
+    else:
+        query_block = query_block.reindex(query.index)
+        choice_block = choice_block.reindex(choices.index)
+        # choices without key (e.g. OSM rows without postcode) are candidates in every block
+        unblocked = choice_block.isna().to_numpy(dtype=bool)
+        for key, block in query.groupby(query_block, sort=False):
+            in_block = choice_block.eq(key).fillna(False).to_numpy(dtype=bool) | unblocked
+            rows.extend(_score_block(block, choices[in_block], k, threshold, scorer))
+        rows.extend(_score_block(query[query_block.isna()], choices, k, threshold, scorer))
+    return pd.DataFrame(rows, columns=["query_index", "rank", "match", "score", "choice_index"])
+
+
+def best_matches(query: pd.Series, choices: pd.Series, threshold: float = 85, **kwargs) -> pd.DataFrame:
+    """Best match and score for every row of query (None and 0 without match), indexed like query."""
+    best = top_matches(query, choices, k=1, threshold=threshold, **kwargs).set_index("query_index")
+    result = pd.DataFrame(index=query.index)
+    result["match"] = best["match"].reindex(query.index).astype(object)
+    result["score"] = best["score"].reindex(query.index).fillna(0).astype(int)
+    result.loc[result["match"].isna(), "match"] = None
+    return result
+
+
+def match_facilities(df_db: pd.DataFrame, df_osm: pd.DataFrame, threshold: float = 85,
+                     db_postcode: str = "adresse_plz", osm_postcode: str = "postcode",
+                     block_prefix: int | None = 2):
+    """Match facilities of the database and OSM in both directions.
+    Adds name_norm, osm_match/match_score/found_in_osm to df_db and
+    name_norm, db_match/match_score/found_in_db to df_osm. block_prefix=None compares all names."""
+    df_db['name_norm'] = normalize_names(df_db['name'])
+    df_osm['name_norm'] = normalize_names(df_osm['name'])
+    blocks = {}
+    if block_prefix:
+        blocks = {"db": postcode_block(df_db[db_postcode], block_prefix),
+                  "osm": postcode_block(df_osm[osm_postcode], block_prefix)}
+
+    # Match facilities DB → OSM
+    best = best_matches(df_db['name_norm'], df_osm['name_norm'], threshold,
+                        query_block=blocks.get("db"), choice_block=blocks.get("osm"))
+    df_db['osm_match'], df_db['match_score'] = best['match'], best['score']
+    df_db['found_in_osm'] = df_db['osm_match'].notna()
+
+    # Match OSM → facilities DB
+    best = best_matches(df_osm['name_norm'], df_db['name_norm'], threshold,
+                        query_block=blocks.get("osm"), choice_block=blocks.get("db"))
+    df_osm['db_match'], df_osm['match_score'] = best['match'], best['score']
+    df_osm['found_in_db'] = df_osm['db_match'].notna()
+
+    return df_db, df_osm
+
+
+def match_associations(df_osm: pd.DataFrame, associations: pd.DataFrame, threshold: float = 85):
+    """Match OSM entries against the association names (not blocked, associations have no single place).
+    Adds asso_match, asso_match_score and found_in_asso to df_osm."""
+    if 'name_norm' not in df_osm:
+        df_osm['name_norm'] = normalize_names(df_osm['name'])
+    associations['name_norm'] = normalize_names(associations['name'])
+    best = best_matches(df_osm['name_norm'], associations['name_norm'], threshold)
+    df_osm['asso_match'], df_osm['asso_match_score'] = best['match'], best['score']
+    df_osm['found_in_asso'] = df_osm['asso_match'].notna()
+    return df_osm
@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "crawling_scripts"))
+import http_client
+from awo1410_minimal import NOMINATIM_URL
+from overpass_pool import OVERPASS_ENDPOINTS
+
+# Local stand-in for Overpass and Nominatim, to benchmark concurrency and retry behavior
+# without being throttled by the public servers.
+# It replays recorded responses (recordings/<service>_<hash>.json) with configurable latency,
+# injected 504/429 errors and a server-side rate limit. With record=True unknown requests are
+# forwarded once to the public service and saved as new recordings.
+# Point the scripts at it with OVERPASS_URL=http://127.0.0.1:8765/api/interpreter and
+# NOMINATIM_URL=http://127.0.0.1:8765 (or pass the URLs to OverpassPool/NominatimProvider).
+
+FAKE_SERVER_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8765,
+    'recordings': Path(__file__).resolve().parent / 'recordings',
+    'record': False,        # forward unknown requests to the public services and save them
+    'latency': 0.5,         # mean seconds per response
+    'jitter': 0.25,         # +- seconds, uniform
+    'error_rate_504': 0.0,  # share of requests answered with 504 Gateway Timeout
+    'error_rate_429': 0.0,  # share of requests answered with 429 Too Many Requests
+    'retry_after': 5,       # Retry-After of injected and rate limited 429s (None: no header)
+    'rate_limit': 0.0,      # requests per second over all clients, 0 disables the limit
+    'slots': 2,             # Overpass slots reported by /api/status
+    'seed': None,           # seed of latency and error injection, for reproducible runs
+}
+
+# replies for requests without recording (and record=False)
+_EMPTY = {
+    'overpass': {"version": 0.6, "generator": "fake_osm_server", "elements": []},
+    'search': [],
+    'reverse': {"error": "Unable to geocode"},
+}
+# parameters that do not change the answer
+_IGNORED_PARAMS = {'format', 'email', 'accept-language'}
+
+
+def request_key(service: str, params: dict) -> str:
+    """Key of a recorded request: the query text with normalized whitespace, or the sorted parameters."""
+    if service == 'overpass':
+        return re.sub(r'\s+', ' ', params.get('data', '')).strip()
+    return '&'.join(f'{k}={v}' for k, v in sorted(params.items()) if k not in _IGNORED_PARAMS)
+
+
+class FakeOsmServer:
+    """Threaded fake Overpass/Nominatim server, usable as context manager.
+
+    config overrides entries of FAKE_SERVER_CONFIG. stats counts answers per service and status."""
+
+    def __init__(self, config: dict = None):
+        self.config = {**FAKE_SERVER_CONFIG, **(config or {})}
+        self.recordings = Path(self.config['recordings'])
+        self.random = random.Random(self.config['seed'])
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._next_free = 0.0
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2] if self._httpd else (self.config['host'], self.config['port'])
+        return f"http://{host}:{port}"
+
+    def _path(self, service: str, key: str) -> Path:
+        return self.recordings / f"{service}_{hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]}.json"
+
+    def _upstream(self, service: str) -> str:
+        if service == 'overpass':
+            return OVERPASS_ENDPOINTS[0]
+        return f"{NOMINATIM_URL}/{service}"
+
+    def lookup(self, service: str, params: dict) -> tuple:
+        """(status, body) of a request, from the recordings or (record=True) from upstream."""
+        key = request_key(service, params)
+        path = self._path(service, key)
+        if path.exists():
+            recorded = json.loads(path.read_text(encoding='utf-8'))
+            return recorded['status'], recorded['body']
+        if not self.config['record']:
+            return 200, _EMPTY[service]
+        response = http_client.get(self._upstream(service), params=params, timeout=300)
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        if response.status_code == 200:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({'service': service, 'request': key, 'status': 200, 'body': body},
+                                       ensure_ascii=False), encoding='utf-8')
+        return response.status_code, body
+
+    def admit(self) -> tuple:
+        """Decide how to answer the next request: (status or None, delay). None means normal reply."""
+        with self._lock:
+            delay = max(0.0, self.config['latency'] + self.random.uniform(-1, 1) * self.config['jitter'])
+            rate = self.config['rate_limit']
+            if rate:
+                now = time.monotonic()
+                if now < self._next_free:
+                    return 429, 0.0
+                self._next_free = now + 1.0 / rate
+            draw = self.random.random()
+            if draw < self.config['error_rate_504']:
+                return 504, delay
+            if draw < self.config['error_rate_504'] + self.config['error_rate_429']:
+                return 429, 0.0
+            return None, delay
+
+    def status_text(self) -> str:
+        return (f"Connected as: 0\nCurrent time: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}\n"
+                f"Rate limit: {self.config['slots']}\n{self.config['slots']} slots available now.\n"
+                f"Currently running queries (pid, space limit, time limit, start time):\n")
+
+    def start(self) -> "FakeOsmServer":
+        """Serve in a background thread. Port 0 picks a free port (see base_url)."""
+        server = self
+
+        class Handler(_Handler):
+            fake = server
+
+        self._httpd = ThreadingHTTPServer((self.config['host'], self.config['port']), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "FakeOsmServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def report(self) -> str:
+        return ", ".join(f"{service} {status}: {n}" for (service, status), n in sorted(self.stats.items()))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake: FakeOsmServer = None
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real servers
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body, content_type: str = "application/json", headers: dict = None):
+        data = body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)
+        data = data.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, params: dict):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/_stats":
+            return self._send(200, {f"{s} {c}": n for (s, c), n in self.fake.stats.items()})
+        if path == "/api/status":
+            return self._send(200, self.fake.status_text(), "text/plain")
+        if path == "/status":
+            return self._send(200, "OK", "text/plain")
+        service = {"/api/interpreter": "overpass", "/search": "search", "/reverse": "reverse"}.get(path)
+        if service is None:
+            return self._send(404, {"error": f"unknown path {path}"})
+
+        status, delay = self.fake.admit()
+        time.sleep(delay)
+        if status is None:
+            try:
+                status, body = self.fake.lookup(service, params)
+            except requests.exceptions.RequestException as e:
+                status, body = 502, {"error": str(e)}
+        else:
+            body = {"error": "injected by fake_osm_server"}
+        with self.fake._lock:
+            self.fake.stats[(service, status)] += 1
+        retry_after = self.fake.config['retry_after']
+        headers = {"Retry-After": retry_after} if status == 429 and retry_after is not None else None
+        self._send(status, body, headers=headers)
+
+    def do_GET(self):
+        self._handle(dict(parse_qsl(urlparse(self.path).query)))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8")
+        self._handle({**dict(parse_qsl(urlparse(self.path).query)), **dict(parse_qsl(body))})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Overpass/Nominatim server")
+    parser.add_argument("--port", type=int, default=FAKE_SERVER_CONFIG['port'])
+    parser.add_argument("--recordings", type=Path, default=FAKE_SERVER_CONFIG['recordings'])
+    parser.add_argument("--record", action="store_true", help="Forward unknown requests upstream and save them")
+    parser.add_argument("--latency", type=float, default=FAKE_SERVER_CONFIG['latency'])
+    parser.add_argument("--jitter", type=float, default=FAKE_SERVER_CONFIG['jitter'])
+    parser.add_argument("--error-rate-504", type=float, default=0.0)
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second, 0 = unlimited")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    fake = FakeOsmServer({
+        'port': args.port, 'recordings': args.recordings, 'record': args.record,
+        'latency': args.latency, 'jitter': args.jitter, 'error_rate_504': args.error_rate_504,
+        'error_rate_429': args.error_rate_429, 'rate_limit': args.rate_limit, 'seed': args.seed,
+    }).start()
+    print(f"Serving on {fake.base_url}")
+    print(f"  OVERPASS_URL={fake.base_url}/api/interpreter NOMINATIM_URL={fake.base_url}")
+    try:
+        while True:
+            time.sleep(10)
+    except KeyboardInterrupt:
+        print(f"\n{fake.report()}")
+        fake.stop()
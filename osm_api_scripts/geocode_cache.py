@@ -0,0 +1,113 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Persistent key/value cache for geocoding results (NominatimProvider, OverpassProvider,
+# reverse_geocode_frame), replacing the cache_results*.json files that were read completely
+# at start and rewritten completely at the end.
+# One SQLite file in WAL mode: lookups are indexed, every write is its own small transaction
+# (a crash loses nothing that was already resolved) and several runs can share the file.
+# None values are "not found" results; with negative_ttl they expire and are looked up again.
+
+# Address fields of the cached reverse geocoding results (Nominatim and offline geocoder)
+ADDRESS_COLUMNS = ["postcode", "city", "street", "housenumber"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key       TEXT PRIMARY KEY,
+    value     TEXT,
+    stored_at REAL NOT NULL
+);
+"""
+
+_MISSING = object()
+
+
+class GeocodeCache:
+    """Dict-like, process and thread safe cache of JSON-serializable results.
+
+    negative_ttl: seconds after which cached None results count as missing again
+    (None keeps them forever, like the old JSON caches).
+    """
+
+    def __init__(self, path, negative_ttl: float = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _lookup(self, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return _MISSING
+        value, stored_at = row
+        if value is None and self.negative_ttl is not None and time.time() - stored_at > self.negative_ttl:
+            return _MISSING
+        return json.loads(value) if value is not None else None
+
+    def get(self, key: str, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key: str) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def __getitem__(self, key: str):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value) -> None:
+        self.update([(key, value)])
+
+    def update(self, items) -> None:
+        """Store several (key, value) pairs (or a dict) in one transaction."""
+        if isinstance(items, dict):
+            items = items.items()
+        now = time.time()
+        rows = [(key, json.dumps(value, ensure_ascii=False) if value is not None else None, now)
+                for key, value in items]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)", rows)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def import_json(self, json_path) -> int:
+        """Copy the entries of an old cache_results*.json file that are not cached yet.
+        Returns the number of imported entries."""
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        try:
+            old = json.loads(json_path.read_text(encoding="utf-8"))
+        except ValueError:
+            return 0
+        new = [(key, value) for key, value in old.items() if key not in self]
+        self.update(new)
+        return len(new)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "GeocodeCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def format_stats(self) -> str:
+        with self._lock:
+            total, negative = self._db.execute(
+                "SELECT COUNT(*), COUNT(*) - COUNT(value) FROM entries").fetchone()
+        return f"{total} entries ({negative} without result)"
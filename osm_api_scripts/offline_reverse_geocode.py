@@ -0,0 +1,157 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+try:
+    import osmium
+except ImportError:  # optional, only needed to read address points from a .osm.pbf extract
+    osmium = None
+
+try:
+    import geopandas as gpd
+except ImportError:  # optional, only needed for postcode polygons
+    gpd = None
+
+from geocode_cache import ADDRESS_COLUMNS  # not reverse_geocode: no geopy needed offline
+
+# Offline alternative to reverse_geocode.geocode_lat_lon, without Nominatim's 1 req/s limit.
+# Address points (OSM addr:* nodes and building centers from a local extract, or a CSV/Parquet
+# with lat, lon, postcode, city, street, housenumber) are put into a KD-tree on the unit sphere,
+# so nearest-address lookups for whole lat/lon arrays are a single vectorized query.
+# Optionally a postcode polygon file (e.g. plz-5stellig.geojson) fills the postcode by
+# point-in-polygon where no address point is close enough.
+
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def _to_xyz(lat, lon) -> np.ndarray:
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def _chord(meters: float) -> float:
+    return 2 * np.sin(meters / (2 * EARTH_RADIUS_M))
+
+
+def _meters(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def _address(tags) -> dict:
+    return {
+        "postcode": tags.get("addr:postcode", ""),
+        "city": tags.get("addr:city") or tags.get("addr:place") or "",
+        "street": tags.get("addr:street", ""),
+        "housenumber": tags.get("addr:housenumber", ""),
+    }
+
+
+if osmium is not None:
+    class _AddressHandler(osmium.SimpleHandler):
+        """Collect nodes and ways (center of their nodes) that carry addr:* tags."""
+
+        def __init__(self):
+            super().__init__()
+            self.rows = []
+
+        def _add(self, tags, lat, lon):
+            address = _address(tags)
+            if address["street"] or address["postcode"]:
+                self.rows.append({"lat": lat, "lon": lon, **address})
+
+        def node(self, n):
+            if n.tags and n.location.valid():
+                self._add(n.tags, n.location.lat, n.location.lon)
+
+        def way(self, w):
+            if not w.tags:
+                return
+            coords = [(nd.lat, nd.lon) for nd in w.nodes if nd.location.valid()]
+            if coords:
+                lats, lons = zip(*coords)
+                self._add(w.tags, (min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2)
+
+
+def load_address_points(path) -> pd.DataFrame:
+    """Read address points from a .csv, .parquet or .osm.pbf file.
+    Returns a DataFrame with lat, lon and the ADDRESS_COLUMNS."""
+    path = Path(path)
+    if path.suffix == ".csv":
+        points = pd.read_csv(path, dtype={"postcode": str, "housenumber": str})
+    elif path.suffix == ".parquet":
+        points = pd.read_parquet(path)
+    elif path.name.endswith(".osm.pbf"):
+        if osmium is None:
+            raise ImportError("Reading address points from PBF requires pyosmium (pip install osmium)")
+        handler = _AddressHandler()
+        handler.apply_file(str(path), locations=True)
+        points = pd.DataFrame(handler.rows, columns=["lat", "lon"] + ADDRESS_COLUMNS)
+    else:
+        raise ValueError(f"Unsupported address file {path}, expected .csv, .parquet or .osm.pbf")
+    missing = {"lat", "lon"} - set(points.columns)
+    if missing:
+        raise ValueError(f"{path} is missing columns {sorted(missing)}")
+    for column in ADDRESS_COLUMNS:
+        if column not in points.columns:
+            points[column] = ""
+    points = points.dropna(subset=["lat", "lon"])
+    points[ADDRESS_COLUMNS] = points[ADDRESS_COLUMNS].fillna("").astype(str)
+    return points.reset_index(drop=True)
+
+
+class OfflineReverseGeocoder:
+    """Nearest-address reverse geocoding over local address points.
+
+    max_distance is the radius in meters within which an address point counts as the address
+    of a coordinate. postcodes is an optional polygon file (anything geopandas can read) whose
+    postcode_column is used where no address point is within max_distance or it has no postcode.
+    Calling the object with (lat, lon) returns the same dict as geocode_lat_lon."""
+
+    def __init__(self, points, max_distance: float = 100.0, postcodes=None,
+                 postcode_column: str = "plz"):
+        self.points = points if isinstance(points, pd.DataFrame) else load_address_points(points)
+        self.max_distance = max_distance
+        self._tree = cKDTree(_to_xyz(self.points["lat"], self.points["lon"]))
+        self._values = self.points[ADDRESS_COLUMNS].to_numpy(dtype=object)
+        self.postcodes = None
+        if postcodes is not None:
+            if gpd is None:
+                raise ImportError("Postcode polygons require geopandas (pip install geopandas)")
+            polygons = gpd.read_file(postcodes).to_crs("EPSG:4326")
+            self.postcodes = polygons[[postcode_column, "geometry"]].rename(columns={postcode_column: "postcode"})
+        print(f"Offline geocoder: {len(self.points)} address points"
+              + (f", {len(self.postcodes)} postcode areas" if self.postcodes is not None else ""))
+
+    def postcode_of(self, lat, lon) -> np.ndarray:
+        """Postcode of the polygon containing each point ('' outside all polygons)."""
+        lat, lon = np.atleast_1d(lat), np.atleast_1d(lon)
+        if self.postcodes is None:
+            return np.full(len(lat), "", dtype=object)
+        points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lon, lat), crs="EPSG:4326")
+        joined = gpd.sjoin(points, self.postcodes, how="left", predicate="within")
+        joined = joined[~joined.index.duplicated(keep="first")].sort_index()
+        return joined["postcode"].fillna("").astype(str).to_numpy(dtype=object)
+
+    def reverse_many(self, lat, lon) -> pd.DataFrame:
+        """Vectorized reverse geocoding of lat/lon arrays.
+        Returns a DataFrame with the ADDRESS_COLUMNS and the distance in meters to the
+        matched address point (NaN where none is within max_distance)."""
+        lat, lon = np.atleast_1d(lat).astype(float), np.atleast_1d(lon).astype(float)
+        chord, index = self._tree.query(_to_xyz(lat, lon), k=1,
+                                        distance_upper_bound=_chord(self.max_distance))
+        found = np.isfinite(chord)
+        result = np.full((len(lat), len(ADDRESS_COLUMNS)), "", dtype=object)
+        result[found] = self._values[index[found]]
+        addresses = pd.DataFrame(result, columns=ADDRESS_COLUMNS)
+        addresses["distance"] = np.where(found, _meters(np.where(found, chord, 0)), np.nan)
+        if self.postcodes is not None:
+            no_postcode = (addresses["postcode"] == "").to_numpy()
+            if no_postcode.any():
+                addresses.loc[no_postcode, "postcode"] = self.postcode_of(lat[no_postcode], lon[no_postcode])
+        return addresses
+
+    def __call__(self, lat, lon) -> dict:
+        return self.reverse_many(lat, lon).iloc[0][ADDRESS_COLUMNS].to_dict()
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from text_normalization import normalize_names
+
+# Deduplication of OSM rows. The same facility shows up several times when regions overlap
+# (Berlin inside Brandenburg, split areas) or when it is mapped both as node and as way/building.
+# Rows are put on a grid with cells of `radius` meters, candidate pairs come from the same and
+# neighbouring cells (a vectorized self-join), and pairs closer than `radius` with similar
+# normalized names are linked. Every connected cluster becomes one row: the record with the most
+# filled fields wins and its empty fields are filled from the other records of the cluster.
+
+EARTH_RADIUS_M = 6_371_008.8
+RICHNESS_COLUMNS = ["name", "street", "housenumber", "postcode", "city", "phone", "email", "website", "amenity"]
+
+
+def _haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def candidate_pairs(lat: np.ndarray, lon: np.ndarray, radius: float) -> tuple:
+    """Index pairs (i < j) of points closer than radius meters, found via a grid of radius-sized cells.
+    Returns (i, j, distance) arrays."""
+    cell_lat = radius / 111_320.0
+    cell_lon = cell_lat / max(np.cos(np.radians(np.nanmean(lat))), 0.1)
+    cells = pd.DataFrame({"i": np.arange(len(lat)),
+                          "x": np.floor(lon / cell_lon).astype(np.int64),
+                          "y": np.floor(lat / cell_lat).astype(np.int64)})
+    pairs = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            shifted = cells.assign(x=cells["x"] + dx, y=cells["y"] + dy)
+            joined = cells.merge(shifted, on=["x", "y"], suffixes=("", "_other"))
+            pairs.append(joined.loc[joined["i"] < joined["i_other"], ["i", "i_other"]].to_numpy())
+    pairs = np.unique(np.concatenate(pairs), axis=0) if pairs else np.empty((0, 2), dtype=np.int64)
+    i, j = pairs[:, 0], pairs[:, 1]
+    distance = _haversine(lat[i], lon[i], lat[j], lon[j])
+    close = distance <= radius
+    return i[close], j[close], distance[close]
+
+
+def _name_scores(names: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    if len(i) == 0:
+        return np.empty(0)
+    if hasattr(process, "cpdist"):  # rapidfuzz >= 3.6: pairwise scores on all cores
+        return process.cpdist(names[i], names[j], scorer=fuzz.token_sort_ratio, workers=-1)
+    return np.array([fuzz.token_sort_ratio(a, b) for a, b in zip(names[i], names[j])])
+
+
+def dedupe_osm(df: pd.DataFrame, radius: float = 50.0, name_threshold: float = 85,
+               unnamed_radius: float = 10.0) -> pd.DataFrame:
+    """Merge duplicate OSM rows into one row per facility.
+
+    Rows with the same (type, osm_id) are always merged. Two rows are duplicates if they are at
+    most radius meters apart and their normalized names score at least name_threshold
+    (token_sort_ratio); if one of them has no name, they must be within unnamed_radius.
+    Adds the columns duplicates (number of merged rows) and osm_ids ("type/id" of all of them)."""
+    if df.empty:
+        return df.copy()
+    df = df.reset_index(drop=True)
+    n = len(df)
+    ids = df["type"].astype(str) + "/" + df["osm_id"].astype(str)
+
+    # same element (overlapping regions): link every row to the first row with its id
+    first_of_id = pd.Series(np.arange(n)).groupby(ids.to_numpy()).transform("first").to_numpy()
+    edges_i, edges_j = [np.arange(n)], [first_of_id]
+
+    # nearby elements with similar names
+    lat = pd.to_numeric(df["lat"], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(df["lon"], errors="coerce").to_numpy(dtype=float)
+    located = np.flatnonzero(~np.isnan(lat) & ~np.isnan(lon))
+    if len(located) > 1:
+        i, j, distance = candidate_pairs(lat[located], lon[located], radius)
+        i, j = located[i], located[j]
+        names = normalize_names(df["name"]).to_numpy(dtype=object)
+        unnamed = (names[i] == "") | (names[j] == "")
+        scores = _name_scores(names, i, j)
+        same = np.where(unnamed, distance <= unnamed_radius, scores >= name_threshold)
+        edges_i.append(i[same])
+        edges_j.append(j[same])
+
+    rows, cols = np.concatenate(edges_i), np.concatenate(edges_j)
+    graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+    _, cluster = connected_components(graph, directed=False)
+
+    filled = df.replace("", pd.NA)
+    richness = filled[[c for c in RICHNESS_COLUMNS if c in filled]].notna().sum(axis=1)
+    order = np.lexsort((np.arange(n), -richness.to_numpy()))
+    filled = filled.iloc[order]
+    cluster_sorted = cluster[order]
+    merged = filled.groupby(cluster_sorted, sort=False).first()
+    merged["duplicates"] = filled.groupby(cluster_sorted, sort=False).size()
+    merged["osm_ids"] = ids.iloc[order].groupby(cluster_sorted, sort=False).agg(
+        lambda values: ";".join(dict.fromkeys(values)))
+    merged = merged.fillna({c: "" for c in df.columns if df[c].dtype == object})
+    print(f"Deduplicated {n} rows into {len(merged)} facilities")
+    return merged.reset_index(drop=True)
@@ -1,13 +1,26 @@
 
-import requests
 import csv
 import time
 import pandas as pd
+import sys
+from pathlib import Path
+
+# shared HTTP client (connection pooling/keep-alive) lives next to the crawlers
+sys.path.append(str(Path(__file__).resolve().parent.parent / "crawling_scripts"))
+import http_client
+from crawl_journal import CrawlJournal
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from overpass_pool import OverpassPool, OverpassUnavailable, get_pool
+from retry_policy import ErrorReport
+from overpass_query import build_awo_query, build_sub_areas_query, dedupe_elements, filter_sub_areas
+from osm_dedup import dedupe_osm
 
 #AWO associations are fetched with help of OSM overpass API. Since API gets easily overloaded (504 Gateway Timeout) , 
 # search is done on region level, and not for whole country. Smaller regions are grouped together
-# script contains delays between requests and retry loops due to frequest time-out errors. 
-# in query are given filters on node way level to narrow the results down. 
+# script contains delays between requests and retry loops due to frequest time-out errors (see retry_policy.py). 
+# in query are given filters on node way level to narrow the results down (query is built in overpass_query.py). 
+# if a region still times out, it is split automatically into smaller administrative areas (see ADMIN_LEVELS),
+# so BUNDES_GROUPS only decides which regions are requested, not how big a single query is.
 
 
 
@@ -22,72 +35,183 @@ BUNDES_GROUPS = [
     ["Saarland","Sachsen","Sachsen-Anhalt", "Schleswig-Holstein","Thüringen"]
 ]
 
-def fetch_osm_region(region_name:str) -> list: 
-    """Fetch AWO/Arbeiterwohlfahrt entries from Overpass for a single region."""
-    query = f"""[out:json][timeout:180];
-            area["name"="{region_name}"]->.searchArea;
-            (
-            node["name"~"(AWO|Arbeiterwohlfahrt)",i](area.searchArea);
-            way["name"~"(AWO|Arbeiterwohlfahrt)",i](area.searchArea);
-            relation["name"~"(AWO|Arbeiterwohlfahrt)",i](area.searchArea);
-
-                node(area.searchArea)["operator"~"(AWO|Arbeiterwohlfahrt)",i];
-                way(area.searchArea)["operator"~"(AWO|Arbeiterwohlfahrt)",i];
-                relation(area.searchArea)["operator"~"(AWO|Arbeiterwohlfahrt)",i];
-
-                node(area.searchArea)["brand"~"(AWO|Arbeiterwohlfahrt)",i];
-                way(area.searchArea)["brand"~"(AWO|Arbeiterwohlfahrt)",i];
-                relation(area.searchArea)["brand"~"(AWO|Arbeiterwohlfahrt)",i];
-
-                );
-                out center;
-             """
-    main_overpass_api = "https://overpass-api.de/api/interpreter"
-    for attempt in range(3):
+# admin_level of Bundesland, Regierungsbezirk, Landkreis/kreisfreie Stadt, Gemeinde.
+# When a region query fails, the area is split into its next lower admin areas.
+ADMIN_LEVELS = [4, 5, 6, 8]
+
+
+def dedupe_rows(rows: list) -> list:
+    """Drop repeated elements, keyed by (type, osm_id), keeping the first occurrence."""
+    seen = set()
+    unique = []
+    for row in rows:
+        key = (row.get("type"), row.get("osm_id"))
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(row)
+    return unique
+
+
+def _query_error(result: dict) -> str | None:
+    """Overpass reports timeouts/memory errors inside a 200 response as 'remark'."""
+    remark = result.get("remark") or ""
+    if "runtime error" in remark or "timed out" in remark or "out of memory" in remark:
+        return remark
+    return None
+
+
+def fetch_sub_areas(area_filter: str, admin_level: int, pool: OverpassPool=None) -> list:
+    """Return (name, area filter) of all administrative areas of admin_level inside an area
+    (without the areas of neighbouring regions that only touch its border)."""
+    pool = pool or get_pool()
+    query = build_sub_areas_query(area_filter, admin_level)
+    result = pool.query(query, timeout=90)
+    # Overpass area ids of relations are the relation id + 3600000000
+    return [(el.get("tags", {}).get("name", str(el["id"])), f"area({3600000000 + el['id']})")
+            for el in filter_sub_areas(result.get("elements", []))]
+
+
+def fetch_osm_area(area_filter: str, region_name: str, pool: OverpassPool=None,
+                   level_index: int=0, report: ErrorReport=None) -> list:
+    """Fetch AWO entries inside one Overpass area; split it into sub areas if the query fails.
+    level_index points into ADMIN_LEVELS and is the level of the given area.
+    Areas that fail for good (and cannot be split) are added to report."""
+    pool = pool or get_pool()
+    query = build_awo_query(area_filter)
+    attempts = []
+    try:
+        result = pool.query(query, timeout=200)
+        error = _query_error(result)
+    except OverpassUnavailable as e:
+        error, attempts = str(e), e.attempts
+    if error is None:
+        return [element_to_row(el, region_name) for el in dedupe_elements(result.get("elements", []))]
+
+    # query too heavy: split into the administrative areas one level below
+    for next_index in range(level_index + 1, len(ADMIN_LEVELS)):
         try:
-            response=requests.get(main_overpass_api, params={'data':query}, timeout=100) 
-            response.raise_for_status()
-            result = response.json()
-        except Exception as e:
-            print(f"Error for {region_name}, {e}. Retry {attempt+1}")
-            return []  
-        time.sleep(10)   
-    r=[]
-    for el in result.get("elements", []):
-        tags=el.get("tags", {})
-        r.append({
-                "osm_id": el.get("id"),
-                "region": region_name,
-                "type": el.get("type"),
-                "name": tags.get("name", ""),
-                "street": tags.get("addr:street", ""),
-                "housenumber": tags.get("addr:housenumber", ""),
-                "postcode": tags.get("addr:postcode", ""),
-                "city": tags.get("addr:city", ""),
-                "lat": el.get("lat") or el.get("center", {}).get("lat"),
-                "lon": el.get("lon") or el.get("center", {}).get("lon"),
-                "phone": tags.get("contact:phone", tags.get("phone", "")),
-                "email": tags.get("contact:email", tags.get("email", "")),
-                "website": tags.get("contact:website", tags.get("website", "")),
-                "amenity": tags.get("amenity", "")
-                })
-    return r
-
-def osm_extractor_groups(nested_list: list, delay: int=10) ->pd.DataFrame:
-    """Loop over groups of regions and fetch results into one DataFrame."""
+            sub_areas = fetch_sub_areas(area_filter, ADMIN_LEVELS[next_index], pool)
+        except OverpassUnavailable as e:
+            print(f"Error for {region_name}, cannot split {area_filter}: {e}")
+            if report is not None:
+                report.add(region_name, area_filter, f"{error}; split failed: {e}", attempts + e.attempts)
+            return []
+        if sub_areas:
+            print(f"{region_name}: {area_filter} failed ({error}), "
+                  f"splitting into {len(sub_areas)} areas of admin_level {ADMIN_LEVELS[next_index]}")
+            rows = []
+            for name, sub_filter in sub_areas:
+                rows.extend(fetch_osm_area(sub_filter, region_name, pool, next_index, report))
+            return dedupe_rows(rows)
+    print(f"Error for {region_name}, {error}")
+    if report is not None:
+        report.add(region_name, area_filter, error, attempts)
+    return []
+
+
+def element_to_row(el: dict, region_name: str) -> dict:
+    """Convert an Overpass JSON element (or an element in the same shape) into one output row."""
+    tags=el.get("tags", {})
+    return {
+            "osm_id": el.get("id"),
+            "region": region_name,
+            "type": el.get("type"),
+            "name": tags.get("name", ""),
+            "street": tags.get("addr:street", ""),
+            "housenumber": tags.get("addr:housenumber", ""),
+            "postcode": tags.get("addr:postcode", ""),
+            "city": tags.get("addr:city", ""),
+            "lat": el.get("lat") or el.get("center", {}).get("lat"),
+            "lon": el.get("lon") or el.get("center", {}).get("lon"),
+            "phone": tags.get("contact:phone", tags.get("phone", "")),
+            "email": tags.get("contact:email", tags.get("email", "")),
+            "website": tags.get("contact:website", tags.get("website", "")),
+            "amenity": tags.get("amenity", "")
+            }
+
+
+def fetch_osm_region(region_name:str, pool: OverpassPool=None, report: ErrorReport=None) -> list: 
+    """Fetch AWO/Arbeiterwohlfahrt entries from Overpass for a single region.
+    The query is sent to the healthiest mirror of the pool and fails over to others on 429/504.
+    If it still fails or times out, the region is split recursively into its
+    Regierungsbezirke/Landkreise/Gemeinden (admin_level) and the results are merged.
+    Areas that could not be fetched are recorded in report instead of silently missing."""
+    return dedupe_rows(fetch_osm_area(f'area["name"="{region_name}"]', region_name, pool, report=report))
+
+def osm_extractor_groups(nested_list: list, delay: int=10, resume: bool=False,
+                         journal_path: Path=Path("osm_journal.sqlite"),
+                         pool: OverpassPool=None, max_workers: int=None,
+                         report: ErrorReport=None, dedupe: bool=False) ->pd.DataFrame:
+    """Fetch all regions of the groups in parallel over the Overpass mirror pool into one DataFrame.
+    delay is the minimum pause between two queries sent to the same mirror, max_workers
+    defaults to the number of free slots of all mirrors.
+    Fetched regions are journaled in journal_path; with resume=True regions of the
+    last interrupted run are taken from the journal instead of being fetched again.
+    Failed (or partially failed) areas are collected in report and are not journaled;
+    the run is then left unfinished, so they are fetched again on resume.
+    With dedupe=True duplicates from overlapping regions and node/way pairs of the same
+    facility are merged (see osm_dedup.py); this gives fewer rows and adds the columns
+    duplicates and osm_ids. By default every fetched element is one row, as before."""
     all_results=[] 
-    for group in nested_list:
-        for region in group:
-            rows = fetch_osm_region(region)
-            all_results.extend(rows)
-            time.sleep(delay)
-    return pd.DataFrame(all_results)
+    report = report if report is not None else ErrorReport()
+    pool = pool or OverpassPool(delay=delay)
+    journal = CrawlJournal(journal_path, kind="osm", resume=resume)
+    print(journal.describe())
+    regions = [region for group in nested_list for region in group if not journal.is_done(region)]
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers or pool.total_slots()) as executor:
+        futures = {executor.submit(fetch_osm_region, region, pool, report): region for region in regions}
+        for future in as_completed(futures):
+            region = futures[future]
+            rows = future.result()
+            print(f"{region}: {len(rows)} entries")
+            if not report.has_errors(region):
+                journal.mark_done(region, rows)
+    rows_by_region = dict(journal.items())
+    for region in (region for group in nested_list for region in group):
+        all_results.extend(rows_by_region.get(region, []))
+    failed = [region for region in regions if report.has_errors(region)]
+    if failed:
+        # the run stays open, so --resume fetches only the failed regions again
+        print(f"{len(failed)} regions failed, run #{journal.run_id} can be resumed")
+    else:
+        journal.finish()
+    journal.close()
+    print(f"Fetched {len(regions)} regions in {time.monotonic() - started:.0f}s")
+    print(pool.report())
+    print(report.summary())
+    print(f"Connections: {http_client.format_stats()}")
+    df = pd.DataFrame(all_results)
+    return dedupe_osm(df) if dedupe else df
 
 
 
 # for running it standalone  (for some reasoon works better when functions are imported in file): 
 if __name__=="__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Fetch AWO entries from OSM Overpass per region")
+    parser.add_argument("--resume", action="store_true", help="continue the last interrupted run")
+    parser.add_argument("--pbf", action="append", metavar="REGION=PATH",
+                        help="scan a local .osm.pbf extract instead of querying Overpass, labelled with REGION, "
+                             "e.g. Berlin=berlin-latest.osm.pbf (repeat for several regions)")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="merge duplicate facilities (overlapping regions, node/way pairs), see osm_dedup.py")
+    args = parser.parse_args()
+    if args.pbf and not all("=" in value for value in args.pbf):
+        parser.error("--pbf expects REGION=PATH, the region is not derived from the file")
+
     name_datetime = time.strftime("%Y%m%d-%H%M%S")
-    df=osm_extractor_groups(BUNDES_GROUPS)
+    report = ErrorReport()
+    if args.pbf:
+        from pbf_extract import extract_awo_from_pbfs
+        extracts = dict(value.split("=", 1) for value in args.pbf)
+        df = extract_awo_from_pbfs({region: Path(path) for region, path in extracts.items()})
+        df = dedupe_osm(df) if args.dedupe else df
+    else:
+        df=osm_extractor_groups(BUNDES_GROUPS, resume=args.resume, report=report, dedupe=args.dedupe)
     df.to_csv(f"awo_{name_datetime}_osmscript.csv", index=False, encoding='utf-8')
     print(f'Saved {len(df)} results total')
+    if len(report):
+        report.save(Path(f"awo_{name_datetime}_osmscript_errors.json"))
+        print(f"Failed areas saved to awo_{name_datetime}_osmscript_errors.json (rerun with --resume)")
@@ -0,0 +1,196 @@
+import os
+import re
+import threading
+import time
+
+import requests
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "crawling_scripts"))
+import http_client
+from retry_policy import RetryPolicy, parse_retry_after
+
+# Pool of Overpass mirrors. Region queries are spread over all mirrors in parallel,
+# each mirror gets at most as many queries as it has free slots (from /api/status).
+# Mirrors answering 429/504 or failing are put on a cooldown (Retry-After or backoff, see
+# retry_policy.py) and the query fails over to the next healthy mirror.
+# Latency is tracked as moving average to prefer fast mirrors.
+
+OVERPASS_ENDPOINTS = [
+    "https://overpass-api.de/api/interpreter",
+    "https://lz4.overpass-api.de/api/interpreter",
+    "https://overpass.openstreetmap.ru/api/interpreter",
+]
+
+
+def overpass_endpoints() -> list:
+    """Mirrors to use: OVERPASS_URL (comma separated, e.g. a local fake_osm_server) or the public ones."""
+    override = os.environ.get("OVERPASS_URL")
+    return [url.strip() for url in override.split(",") if url.strip()] if override else OVERPASS_ENDPOINTS
+
+
+_SLOTS_NOW_RE = re.compile(r"(\d+) slots? available now")
+_SLOT_AFTER_RE = re.compile(r"Slot available after: .*?, in (-?\d+) seconds?")
+_RATE_LIMIT_RE = re.compile(r"Rate limit: (\d+)")
+
+
+class OverpassUnavailable(Exception):
+    """Raised when a query failed on every mirror of the pool or cannot be retried."""
+
+    def __init__(self, message: str, attempts: list = None, status: int = None):
+        super().__init__(message)
+        self.attempts = attempts or []
+        self.status = status
+
+
+class OverpassEndpoint:
+    """Health and latency bookkeeping for one Overpass mirror."""
+
+    def __init__(self, url: str, max_slots: int = 2):
+        self.url = url
+        self.status_url = url.rsplit("/", 1)[0] + "/status"
+        self.max_slots = max_slots
+        self.in_flight = 0
+        self.latency = None          # moving average of successful query durations
+        self.successes = 0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.next_allowed = 0.0      # earliest start of the next query (min. pause per mirror)
+        self.status_checked = 0.0
+
+    def available(self, now: float) -> bool:
+        return (now >= self.cooldown_until and now >= self.next_allowed
+                and self.in_flight < self.max_slots)
+
+    def score(self) -> float:
+        """Lower is better: expected latency, penalized by recent failures."""
+        latency = self.latency if self.latency is not None else 30.0
+        return latency * (1 + self.failures) + 10 * self.in_flight
+
+    def __repr__(self) -> str:
+        latency = f"{self.latency:.1f}s" if self.latency is not None else "n/a"
+        return (f"{self.url}: {self.successes} ok, {self.failures} failed, "
+                f"avg latency {latency}, slots {self.max_slots}")
+
+
+class OverpassPool:
+    """Thread-safe pool of Overpass mirrors with failover and slot awareness."""
+
+    def __init__(self, endpoints: list = None, delay: float = 0.0, status_ttl: float = 30.0,
+                 check_status: bool = True, policy: RetryPolicy = None):
+        self.endpoints = [OverpassEndpoint(url) for url in (endpoints or overpass_endpoints())]
+        self.policy = policy or RetryPolicy()
+        self.delay = delay
+        self.status_ttl = status_ttl
+        self.check_status = check_status
+        self._cond = threading.Condition()
+
+    def total_slots(self) -> int:
+        return sum(ep.max_slots for ep in self.endpoints)
+
+    def refresh_status(self, endpoint: OverpassEndpoint) -> None:
+        """Read /api/status of a mirror and update its slots and cooldown."""
+        try:
+            text = http_client.get(endpoint.status_url, timeout=10).text
+        except requests.exceptions.RequestException:
+            return
+        now = time.monotonic()
+        endpoint.status_checked = now
+        rate_limit = _RATE_LIMIT_RE.search(text)
+        if rate_limit and int(rate_limit.group(1)) > 0:
+            endpoint.max_slots = int(rate_limit.group(1))
+        if _SLOTS_NOW_RE.search(text):
+            return
+        waits = [int(s) for s in _SLOT_AFTER_RE.findall(text)]
+        if waits:
+            endpoint.cooldown_until = max(endpoint.cooldown_until, now + max(0, min(waits)))
+
+    def acquire(self, exclude: set = frozenset()) -> OverpassEndpoint:
+        """Block until a healthy mirror has a free slot and reserve it."""
+        if self.check_status:
+            for ep in self.endpoints:
+                if time.monotonic() - ep.status_checked > self.status_ttl:
+                    self.refresh_status(ep)
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                candidates = [ep for ep in self.endpoints if ep.url not in exclude and ep.available(now)]
+                if not candidates and exclude:
+                    # every other mirror is busy: allow retrying on an already tried one
+                    candidates = [ep for ep in self.endpoints if ep.available(now)]
+                if candidates:
+                    best = min(candidates, key=OverpassEndpoint.score)
+                    best.in_flight += 1
+                    best.next_allowed = now + self.delay
+                    return best
+                wake = min(max(ep.cooldown_until, ep.next_allowed) for ep in self.endpoints)
+                self._cond.wait(timeout=max(0.5, wake - now))
+
+    def release(self, endpoint: OverpassEndpoint, ok: bool, duration: float = None,
+                cooldown: float = 0.0) -> None:
+        """Return a slot and record the outcome of the query."""
+        with self._cond:
+            endpoint.in_flight -= 1
+            if ok:
+                endpoint.successes += 1
+                endpoint.failures = max(0, endpoint.failures - 1)
+                if duration is not None:
+                    endpoint.latency = duration if endpoint.latency is None else 0.7 * endpoint.latency + 0.3 * duration
+            else:
+                endpoint.failures += 1
+                endpoint.cooldown_until = max(endpoint.cooldown_until, time.monotonic() + cooldown)
+            self._cond.notify_all()
+
+    def query(self, query: str, timeout: int = 200, policy: RetryPolicy = None) -> dict:
+        """Run an Overpass QL query with retries according to the policy.
+        Stops on the first success. Failed mirrors get a cooldown of Retry-After or the
+        policy's backoff with jitter, and the next attempt goes to another healthy mirror
+        (or waits for the cooldown if none is left). Non-retryable errors raise at once."""
+        policy = policy or self.policy
+        tried = set()
+        attempts = []
+        for attempt in range(policy.max_attempts):
+            endpoint = self.acquire(exclude=tried)
+            tried.add(endpoint.url)
+            started = time.monotonic()
+            status, retry_after = None, None
+            try:
+                response = http_client.get(endpoint.url, params={"data": query}, timeout=timeout)
+                status = response.status_code
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                response.raise_for_status()
+                result = response.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                if isinstance(e, ValueError):
+                    status = None  # truncated/invalid JSON body, worth another try
+                cooldown = policy.delay(attempt, retry_after)
+                self.release(endpoint, ok=False, cooldown=cooldown)
+                attempts.append({"endpoint": endpoint.url, "status": status, "error": str(e),
+                                 "retry_after": retry_after, "cooldown": round(cooldown, 1)})
+                if not policy.should_retry(status):
+                    raise OverpassUnavailable(f"{endpoint.url}: {e}", attempts, status)
+                print(f"Error on {endpoint.url}: {e}, retrying in another mirror or after "
+                      f"{cooldown:.0f}s ({attempt + 1}/{policy.max_attempts})")
+                continue
+            self.release(endpoint, ok=True, duration=time.monotonic() - started)
+            return result
+        last = attempts[-1] if attempts else {}
+        raise OverpassUnavailable(f"{last.get('endpoint')}: {last.get('error')} "
+                                  f"(gave up after {len(attempts)} attempts)", attempts, last.get("status"))
+
+    def report(self) -> str:
+        return "\n".join(repr(ep) for ep in self.endpoints)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool() -> OverpassPool:
+    """Shared pool used by fetch_osm_region when no pool is given."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = OverpassPool()
+        return _default_pool
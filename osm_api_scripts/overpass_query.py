@@ -0,0 +1,78 @@
+# Builder for the AWO Overpass QL query.
+# One nwr statement per matched tag key replaces the former node/way/relation x name/operator/brand
+# statements (9 -> 3), "out tags center qt" skips metadata and full geometry and returns elements
+# in quadtile order, which is the cheapest output mode for the server.
+# The union already returns every element once; dedupe_elements guards the client side too
+# (e.g. when results of split areas or mirrors are merged).
+
+AWO_PATTERN = "AWO|Arbeiterwohlfahrt"
+MATCH_KEYS = ("name", "operator", "brand")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def build_awo_query(area_filter: str, pattern: str = AWO_PATTERN, keys: tuple = MATCH_KEYS,
+                    timeout: int = 180, single_filter: bool = False) -> str:
+    """Build the Overpass QL query for all elements in an area whose keys match pattern.
+
+    area_filter is an Overpass area statement, e.g. 'area["name"="Berlin"]' or 'area(3600062422)'.
+    With single_filter=True one nwr statement with a key regex ([~"^(name|operator|brand)$"~...])
+    is used. It is shorter, but key regexes cannot use the per-key tag index of Overpass,
+    so by default there is one indexed nwr statement per key.
+    """
+    pattern = _escape(pattern)
+    if single_filter:
+        key_regex = "^(" + "|".join(keys) + ")$"
+        statements = f'nwr(area.searchArea)[~"{key_regex}"~"{pattern}",i];'
+    else:
+        statements = "(\n" + "\n".join(
+            f'  nwr["{_escape(key)}"~"{pattern}",i](area.searchArea);' for key in keys) + "\n);"
+    return (f"[out:json][timeout:{timeout}];\n"
+            f"{area_filter}->.searchArea;\n"
+            f"{statements}\n"
+            f"out tags center qt;")
+
+
+# Keys of the official German area codes. The code of a sub area starts with the code of its parent
+# (Land 2 digits, Regierungsbezirk 3, Kreis 5, Gemeinde 12 / 8 digits).
+AREA_CODE_KEYS = ("de:regionalschluessel", "de:amtlicher_gemeindeschluessel")
+
+
+def build_sub_areas_query(area_filter: str, admin_level: int, timeout: int = 60) -> str:
+    """Query for all administrative boundaries of admin_level in an area (ids and tags only).
+    The tags of the parent area are returned first; rel(area) also matches boundaries of
+    neighbouring areas that only share border ways, filter_sub_areas removes them."""
+    return (f"[out:json][timeout:{timeout}];\n"
+            f"{area_filter}->.parent;\n"
+            f".parent out tags;\n"
+            f'rel(area.parent)["boundary"="administrative"]["admin_level"="{admin_level}"];\n'
+            f"out tags qt;")
+
+
+def filter_sub_areas(elements: list) -> list:
+    """Relations of a build_sub_areas_query result that really lie inside the parent area,
+    i.e. whose official area code starts with the parent's code.
+    Relations without a code are kept, as are all relations if the parent has no code."""
+    parent = next((el.get("tags", {}) for el in elements if el.get("type") == "area"), {})
+    relations = [el for el in elements if el.get("type") == "relation"]
+    for key in AREA_CODE_KEYS:
+        prefix = parent.get(key)
+        if prefix:
+            return [el for el in relations
+                    if not el.get("tags", {}).get(key) or el["tags"][key].startswith(prefix)]
+    return relations
+
+
+def dedupe_elements(elements: list) -> list:
+    """Keep the first occurrence of every (type, id) pair."""
+    seen = set()
+    unique = []
+    for el in elements:
+        key = (el.get("type"), el.get("id"))
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(el)
+    return unique
@@ -0,0 +1,268 @@
+import re
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import osmium
+except ImportError:  # optional, only needed for the offline PBF backend
+    osmium = None
+
+from overpass_query import AWO_PATTERN, MATCH_KEYS
+from osm_script import element_to_row
+
+# Offline alternative to Overpass: scan a local Geofabrik extract (e.g. germany-latest.osm.pbf)
+# with the same AWO name/operator/brand filter and produce the same rows as fetch_osm_region.
+# The file is split into its PBF blocks, groups of blocks are decoded by pyosmium in a process
+# pool, so all cores are used. Way/relation centers are the bbox centers of their nodes, like
+# Overpass "out center". Three parallel passes: matching elements, node refs of relation member
+# ways, coordinates of all needed nodes.
+# A PBF file knows nothing about our regions: all rows of a file get the region the caller passes.
+# To keep the per-Bundesland region column of fetch_osm_region, scan one Geofabrik state extract
+# per region (e.g. berlin-latest.osm.pbf for "Berlin") with extract_awo_from_pbfs.
+
+AWO_RE = re.compile(AWO_PATTERN, re.I)
+
+_worker_ids = {}  # ids needed by the current pass, set once per worker process
+
+
+def _varint(data: bytes, pos: int) -> tuple:
+    result, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _parse_blob_header(data: bytes) -> tuple:
+    """Return (type, datasize) of a PBF BlobHeader protobuf message."""
+    pos, blob_type, datasize = 0, None, None
+    while pos < len(data):
+        key, pos = _varint(data, pos)
+        field, wire = key >> 3, key & 0x07
+        if wire == 0:
+            value, pos = _varint(data, pos)
+            if field == 3:
+                datasize = value
+        elif wire == 2:
+            length, pos = _varint(data, pos)
+            if field == 1:
+                blob_type = data[pos:pos + length].decode("ascii")
+            pos += length
+        else:
+            raise ValueError(f"Unexpected wire type {wire} in BlobHeader")
+    return blob_type, datasize
+
+
+def index_blocks(path: Path) -> tuple:
+    """Scan the block structure of a PBF file without decoding any data.
+    Returns ((offset, length) of the OSMHeader block, [(offset, length) of all OSMData blocks])."""
+    header, blocks = None, []
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            size_bytes = f.read(4)
+            if len(size_bytes) < 4:
+                break
+            (header_size,) = struct.unpack(">I", size_bytes)
+            blob_type, datasize = _parse_blob_header(f.read(header_size))
+            length = 4 + header_size + datasize
+            if blob_type == "OSMHeader":
+                header = (offset, length)
+            elif blob_type == "OSMData":
+                blocks.append((offset, length))
+            f.seek(datasize, 1)
+            offset += length
+    if header is None:
+        raise ValueError(f"{path} has no OSMHeader block, is it a PBF file?")
+    return header, blocks
+
+
+def _read_chunk(path: str, header: tuple, chunk: list) -> bytes:
+    """Header block plus a run of data blocks form a valid PBF stream on their own."""
+    parts = []
+    with open(path, "rb") as f:
+        for offset, length in [header] + chunk:
+            f.seek(offset)
+            parts.append(f.read(length))
+    return b"".join(parts)
+
+
+def _is_awo(tags) -> bool:
+    return any(AWO_RE.search(tags.get(key) or "") for key in MATCH_KEYS)
+
+
+def _filters(keys: tuple = (), ids=None) -> list:
+    """C++ side filters (pyosmium >= 3.7) so only candidates reach the Python callbacks."""
+    if not hasattr(osmium, "filter"):
+        return []
+    if keys and hasattr(osmium.filter, "KeyFilter"):
+        return [osmium.filter.KeyFilter(*keys)]
+    if ids is not None and hasattr(osmium.filter, "IdFilter"):
+        return [osmium.filter.IdFilter(ids)]
+    return []
+
+
+if osmium is not None:
+    class _MatchHandler(osmium.SimpleHandler):
+        """Pass 1: elements whose name/operator/brand matches the AWO pattern."""
+
+        def __init__(self):
+            super().__init__()
+            self.nodes, self.ways, self.relations = [], [], []
+
+        def node(self, n):
+            tags = {t.k: t.v for t in n.tags}
+            if _is_awo(tags) and n.location.valid():
+                self.nodes.append({"type": "node", "id": n.id, "tags": tags,
+                                   "lat": n.location.lat, "lon": n.location.lon})
+
+        def way(self, w):
+            tags = {t.k: t.v for t in w.tags}
+            if _is_awo(tags):
+                self.ways.append({"type": "way", "id": w.id, "tags": tags,
+                                  "refs": [nd.ref for nd in w.nodes]})
+
+        def relation(self, r):
+            tags = {t.k: t.v for t in r.tags}
+            if _is_awo(tags):
+                self.relations.append({"type": "relation", "id": r.id, "tags": tags,
+                                       "members": [(m.type, m.ref) for m in r.members]})
+
+    class _WayRefsHandler(osmium.SimpleHandler):
+        """Pass 2: node refs of the member ways of matched relations."""
+
+        def __init__(self, way_ids):
+            super().__init__()
+            self.way_ids = way_ids
+            self.refs = {}
+
+        def way(self, w):
+            if w.id in self.way_ids:
+                self.refs[w.id] = [nd.ref for nd in w.nodes]
+
+    class _NodeCoordsHandler(osmium.SimpleHandler):
+        """Pass 3: coordinates of all nodes needed for centers."""
+
+        def __init__(self, node_ids):
+            super().__init__()
+            self.node_ids = node_ids
+            self.coords = {}
+
+        def node(self, n):
+            if n.id in self.node_ids and n.location.valid():
+                self.coords[n.id] = (n.location.lat, n.location.lon)
+
+
+def _apply(handler, data: bytes, filters: list) -> None:
+    """apply_buffer with C++ filters; pyosmium < 3.7 has no filters argument at all."""
+    if filters:
+        handler.apply_buffer(data, "pbf", filters=filters)
+    else:
+        handler.apply_buffer(data, "pbf")
+
+
+def _init_worker(ids: dict) -> None:
+    _worker_ids.clear()
+    _worker_ids.update(ids)
+
+
+def _run_chunk(task: tuple):
+    kind, path, header, chunk = task
+    data = _read_chunk(path, header, chunk)
+    if kind == "match":
+        handler = _MatchHandler()
+        _apply(handler, data, _filters(keys=MATCH_KEYS))
+        return handler.nodes, handler.ways, handler.relations
+    if kind == "way_refs":
+        handler = _WayRefsHandler(_worker_ids["ways"])
+        _apply(handler, data, _filters(ids=_worker_ids["ways"]))
+        return handler.refs
+    handler = _NodeCoordsHandler(_worker_ids["nodes"])
+    _apply(handler, data, _filters(ids=_worker_ids["nodes"]))
+    return handler.coords
+
+
+def _bbox_center(coords: list) -> dict | None:
+    if not coords:
+        return None
+    lats = [c[0] for c in coords]
+    lons = [c[1] for c in coords]
+    return {"lat": (min(lats) + max(lats)) / 2, "lon": (min(lons) + max(lons)) / 2}
+
+
+def _parallel(kind: str, path: Path, header: tuple, chunks: list, max_workers: int,
+              ids: dict = None) -> list:
+    tasks = [(kind, str(path), header, chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(ids or {},)) as executor:
+        return list(executor.map(_run_chunk, tasks))
+
+
+def extract_awo_from_pbf(pbf_path, region_name: str, max_workers: int = None,
+                         blocks_per_chunk: int = 64) -> pd.DataFrame:
+    """Extract AWO/Arbeiterwohlfahrt entries from a local .osm.pbf file.
+    Same filter and row schema as fetch_osm_region, but region is region_name for all rows
+    (it is not derived from the data, so pass the region the extract covers).
+    Blocks of the file are decoded in parallel by max_workers processes (default: all cores)."""
+    if osmium is None:
+        raise ImportError("PBF extraction requires pyosmium (pip install osmium)")
+    pbf_path = Path(pbf_path)
+    started = time.monotonic()
+    header, blocks = index_blocks(pbf_path)
+    chunks = [blocks[i:i + blocks_per_chunk] for i in range(0, len(blocks), blocks_per_chunk)]
+    print(f"{pbf_path.name}: {len(blocks)} blocks in {len(chunks)} chunks")
+
+    # pass 1: matching nodes, ways and relations
+    nodes, ways, relations = [], [], []
+    for n, w, r in _parallel("match", pbf_path, header, chunks, max_workers):
+        nodes.extend(n)
+        ways.extend(w)
+        relations.extend(r)
+    print(f"Matched {len(nodes)} nodes, {len(ways)} ways, {len(relations)} relations")
+
+    # pass 2: node refs of ways that are members of matched relations
+    way_refs = {w["id"]: w["refs"] for w in ways}
+    member_ways = {ref for r in relations for kind, ref in r["members"] if kind == "w"} - set(way_refs)
+    if member_ways:
+        for refs in _parallel("way_refs", pbf_path, header, chunks, max_workers, {"ways": member_ways}):
+            way_refs.update(refs)
+
+    # pass 3: coordinates of all nodes needed for way and relation centers
+    needed = {ref for refs in way_refs.values() for ref in refs}
+    needed |= {ref for r in relations for kind, ref in r["members"] if kind == "n"}
+    coords = {}
+    if needed:
+        for part in _parallel("node_coords", pbf_path, header, chunks, max_workers, {"nodes": needed}):
+            coords.update(part)
+
+    elements = list(nodes)
+    for w in ways:
+        elements.append({"type": "way", "id": w["id"], "tags": w["tags"],
+                         "center": _bbox_center([coords[r] for r in w["refs"] if r in coords]) or {}})
+    for r in relations:
+        points = []
+        for kind, ref in r["members"]:
+            if kind == "n" and ref in coords:
+                points.append(coords[ref])
+            elif kind == "w":
+                points.extend(coords[n] for n in way_refs.get(ref, []) if n in coords)
+        elements.append({"type": "relation", "id": r["id"], "tags": r["tags"],
+                         "center": _bbox_center(points) or {}})
+
+    rows = [element_to_row(el, region_name) for el in elements]
+    print(f"Extracted {len(rows)} entries from {pbf_path.name} in {time.monotonic() - started:.0f}s")
+    return pd.DataFrame(rows)
+
+
+def extract_awo_from_pbfs(extracts: dict, **kwargs) -> pd.DataFrame:
+    """Extract several regional PBF files ({region name: path}) into one DataFrame,
+    each row labelled with the region of its file."""
+    frames = [extract_awo_from_pbf(path, region, **kwargs) for region, path in extracts.items()]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
@@ -0,0 +1,94 @@
+import json
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import pandas as pd
+
+# Retry policy for Overpass (and other OSM) requests: stop on the first success,
+# back off exponentially with jitter on 429/5xx, honor the server's Retry-After header,
+# and collect requests that failed for good in a structured ErrorReport.
+
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def parse_retry_after(value) -> float | None:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds from now."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter, capped, with Retry-After taking precedence."""
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 5.0, max_delay: float = 300.0,
+                 retry_statuses: tuple = RETRY_STATUSES):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+
+    def should_retry(self, status: int | None) -> bool:
+        """Connection errors (status None) and throttling/gateway errors are retried."""
+        return status is None or status in self.retry_statuses
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """Seconds to wait after the given (0-based) failed attempt."""
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+        # "equal jitter": at least half the backoff, spread so parallel workers do not retry in lockstep
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+class ErrorReport:
+    """Thread-safe collection of requests that failed after all retries."""
+
+    def __init__(self):
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def add(self, region: str, area: str, error: str, attempts: list = None) -> None:
+        with self._lock:
+            self.errors.append({
+                "region": region,
+                "area": area,
+                "error": error,
+                "attempts": attempts or [],
+                "time": datetime.now().isoformat(timespec="seconds"),
+            })
+
+    def has_errors(self, region: str) -> bool:
+        with self._lock:
+            return any(e["region"] == region for e in self.errors)
+
+    def __len__(self) -> int:
+        return len(self.errors)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        rows = [{**e, "attempts": len(e["attempts"])} for e in self.errors]
+        return pd.DataFrame(rows, columns=["region", "area", "error", "attempts", "time"])
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.errors, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def summary(self) -> str:
+        if not self.errors:
+            return "No failed requests"
+        regions = sorted({e["region"] for e in self.errors})
+        return f"{len(self.errors)} failed requests in {len(regions)} regions: {', '.join(regions)}"
+
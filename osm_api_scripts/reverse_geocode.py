@@ -1,28 +1,132 @@
+import sys
+from urllib.parse import urlparse
+from functools import lru_cache
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "crawling_scripts"))
+from rate_limiter import get_limiter
+from geocode_cache import ADDRESS_COLUMNS, GeocodeCache
+from awo1410_minimal import nominatim_url
 
 #This code uses Nominatim (geocoder behind OSM) to reverse-geocode latitute/longitude into street,city, postcode, etc
 #it should be applied on dataframe having only lat/long values
+#reverse_geocode_frame fills all missing address columns of a DataFrame in one pass: coordinates are rounded
+#and deduplicated, looked up in a persistent cache first, and only the misses are sent to Nominatim
+#(1 req/s, through the rate limiter shared with the other Nominatim clients).
+#Pass geocoder=OfflineReverseGeocoder(...) (offline_reverse_geocode.py) to fill from local address data instead;
+#its nearest-point approximations go to a cache of their own, so they never pass for Nominatim answers.
+
+REVERSE_CACHE_PATH = Path("cache_reverse_geocode.sqlite")
+OFFLINE_REVERSE_CACHE_PATH = Path("cache_reverse_geocode_offline.sqlite")
+
+
+@lru_cache(maxsize=1)
+def _reverse_geocoder():
+    """One Nominatim client shared by all calls, throttled by the shared rate limiter."""
+    url = urlparse(nominatim_url())
+    geolocator = Nominatim(user_agent="awo_extractor", domain=url.netloc + url.path, scheme=url.scheme)
 
+    def reverse(query, **kwargs):
+        get_limiter().acquire(geolocator.domain)
+        return geolocator.reverse(query, **kwargs)
+    return reverse
+
+
+def _empty_address() -> dict:
+    return {column: "" for column in ADDRESS_COLUMNS}
 
 
 def geocode_lat_lon(lat, lon):
-    geolocator = Nominatim(user_agent="awo_extractor")
-    geocode = RateLimiter(geolocator.reverse, min_delay_seconds=1)
-    try:
-        location=geocode((lat,lon), language='de', addressdetails=True)
-        if location and location.raw.get("address"):
-            addr=location.raw["address"]
-            return {
-                "postcode": addr.get("postcode", ""),
-                "city": addr.get("town") or addr.get("city") or addr.get("village") or "",
-                "street": addr.get("road", ""),
-                "housenumber": addr.get("house_number", "")
-            }
-    except Exception as e:
-        print("Error:", e)
-        return {"postcode": "", "city": "", "street": "", "housenumber": ""}
+    """Address of a coordinate, empty strings if Nominatim knows none.
+    Request errors (timeouts, rate limits, 5xx) are raised, so they are not mistaken for
+    "no address" and cached."""
+    geocode = _reverse_geocoder()
+    location=geocode((lat,lon), language='de', addressdetails=True)
+    if location and location.raw.get("address"):
+        addr=location.raw["address"]
+        return {
+            "postcode": addr.get("postcode", ""),
+            "city": addr.get("town") or addr.get("city") or addr.get("village") or "",
+            "street": addr.get("road", ""),
+            "housenumber": addr.get("house_number", "")
+        }
+    return _empty_address()
+
+
+def coordinate_key(lat, lon, precision: int = 5) -> str:
+    """Cache key of a coordinate, rounded to precision decimals (5 decimals ~ 1 m)."""
+    return f"{round(float(lat), precision):.{precision}f},{round(float(lon), precision):.{precision}f}"
+
+
+def _is_missing(series: pd.Series) -> pd.Series:
+    return series.isna() | series.astype(str).str.strip().eq("")
+
+
+def reverse_geocode_frame(df: pd.DataFrame, precision: int = 5, cache_path: Path = None,
+                          columns: list = ADDRESS_COLUMNS, lat_col: str = "lat", lon_col: str = "lon",
+                          geocoder=geocode_lat_lon, negative_ttl: float = None) -> pd.DataFrame:
+    """Fill missing address columns of df by reverse geocoding its coordinates, in one pass.
+    Rows missing any of columns are collected, their coordinates rounded to precision decimals
+    and deduplicated. Known coordinates are taken from the cache at cache_path (default:
+    REVERSE_CACHE_PATH, OFFLINE_REVERSE_CACHE_PATH for an offline geocoder), only unknown ones
+    are passed to geocoder. Every result is written to the cache at once, so an interrupted run
+    keeps its progress; coordinates without address are retried after negative_ttl seconds,
+    coordinates whose lookup failed with an error are not cached and retried on the next run.
+    Only missing cells are filled, existing values are kept.
+    Returns a copy of df."""
+    df = df.copy()
+    for column in columns:
+        if column not in df.columns:
+            df[column] = pd.NA
+    missing = pd.concat([_is_missing(df[c]) for c in columns], axis=1)
+    rows = missing.any(axis=1) & df[lat_col].notna() & df[lon_col].notna()
+    if not rows.any():
+        return df
+
+    keys = pd.Series([coordinate_key(lat, lon, precision)
+                      for lat, lon in zip(df.loc[rows, lat_col], df.loc[rows, lon_col])],
+                     index=df.index[rows])
+    offline = hasattr(geocoder, "reverse_many")
+    if cache_path is None:
+        cache_path = OFFLINE_REVERSE_CACHE_PATH if offline else REVERSE_CACHE_PATH
+    cache = GeocodeCache(cache_path, negative_ttl=negative_ttl)
+    unique_keys = keys.unique()
+    misses = [key for key in unique_keys if key not in cache]
+    print(f"{int(rows.sum())} rows, {len(unique_keys)} unique coordinates, "
+          f"{len(unique_keys) - len(misses)} cached, {len(misses)} to geocode")
 
+    if misses and offline:
+        # offline geocoder (offline_reverse_geocode.py): all misses in one vectorized query
+        lats, lons = np.array([[float(v) for v in key.split(",")] for key in misses]).T
+        found = geocoder.reverse_many(lats, lons)[columns]
+        # points without a near address are not cached, a later run with more address data may fill them
+        cache.update((key, address) for key, address in zip(misses, found.to_dict("records"))
+                     if any(address.values()))
+    else:
+        errors = 0
+        for done, key in enumerate(misses, 1):
+            lat, lon = (float(v) for v in key.split(","))
+            try:
+                address = geocoder(lat, lon)
+            except Exception as e:
+                errors += 1
+                print(f"Error for {key}: {e}")  # not cached, retried next run
+                continue
+            cache[key] = address if any(address.values()) else None
+            if done % 50 == 0:
+                print(f"  geocoded {done}/{len(misses)}")
+        if errors:
+            print(f"{errors} coordinates failed and were not cached")
 
+    resolved = {key: cache.get(key) or _empty_address() for key in unique_keys}
+    cache.close()
+    addresses = pd.DataFrame([resolved[key] for key in keys], index=keys.index).reindex(columns=columns)
+    addresses = addresses.replace("", pd.NA)
+    for column in columns:
+        fill = missing.loc[rows, column] & addresses[column].notna()
+        df.loc[fill[fill].index, column] = addresses.loc[fill, column]
+    return df
@@ -0,0 +1,26 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("rapidfuzz")
+
+from facility_matching import best_matches, postcode_block, top_matches
+
+
+def test_choice_without_postcode_matches_blocked_query():
+    query = pd.Series(["awo kita sonnenschein", "awo seniorenzentrum"], index=[10, 11])
+    choices = pd.Series(["awo kita sonnenschein", "awo seniorenzentrum"], index=[0, 1])
+    query_block = postcode_block(pd.Series(["10115", "80331"], index=query.index))
+    choice_block = postcode_block(pd.Series([None, "80331"], index=choices.index))
+
+    matches = top_matches(query, choices, query_block, choice_block, k=1)
+
+    assert dict(zip(matches["query_index"], matches["choice_index"])) == {10: 0, 11: 1}
+
+
+def test_blocking_keeps_other_postcodes_apart():
+    query = pd.Series(["awo kita sonnenschein"])
+    choices = pd.Series(["awo kita sonnenschein"])
+    best = best_matches(query, choices, query_block=postcode_block(pd.Series(["10115"])),
+                        choice_block=postcode_block(pd.Series(["80331"])))
+
+    assert best.loc[0, "match"] is None
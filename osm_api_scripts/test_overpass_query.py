@@ -0,0 +1,32 @@
+from overpass_query import build_sub_areas_query, filter_sub_areas
+
+
+def _relation(id_, name, code=None):
+    tags = {"name": name, "boundary": "administrative"}
+    if code:
+        tags["de:regionalschluessel"] = code
+    return {"type": "relation", "id": id_, "tags": tags}
+
+
+def test_filter_sub_areas_drops_neighbouring_districts():
+    elements = [
+        {"type": "area", "id": 3600062504, "tags": {"name": "Brandenburg", "de:regionalschluessel": "12"}},
+        _relation(1, "Barnim", "120600000000"),
+        _relation(2, "Uckermark", "120730000000"),
+        _relation(3, "Mecklenburgische Seenplatte", "130710000000"),  # shares a border with Uckermark
+        _relation(4, "ohne Schlüssel"),
+    ]
+
+    assert [el["id"] for el in filter_sub_areas(elements)] == [1, 2, 4]
+
+
+def test_filter_sub_areas_keeps_all_without_parent_code():
+    elements = [{"type": "area", "id": 1, "tags": {"name": "X"}}, _relation(1, "A", "12"), _relation(2, "B", "13")]
+
+    assert [el["id"] for el in filter_sub_areas(elements)] == [1, 2]
+
+
+def test_sub_areas_query_returns_parent_tags_first():
+    query = build_sub_areas_query('area["name"="Brandenburg"]', 6)
+
+    assert query.index(".parent out tags;") < query.index('rel(area.parent)')
@@ -0,0 +1,49 @@
+import pytest
+
+osmium = pytest.importorskip("osmium")
+pytest.importorskip("pandas")
+
+from osmium.osm.mutable import Node, Relation, Way
+
+from pbf_extract import extract_awo_from_pbf
+
+
+@pytest.fixture
+def awo_pbf(tmp_path):
+    path = tmp_path / "awo.osm.pbf"
+    writer = osmium.SimpleWriter(str(path))
+    try:
+        # AWO node
+        writer.add_node(Node(id=1, location=(13.40, 52.52), tags={"name": "AWO Kita Sonnenschein"}))
+        # nodes of the AWO way (a square around 52.1, 13.1)
+        for node_id, lon, lat in [(2, 13.0, 52.0), (3, 13.2, 52.0), (4, 13.2, 52.2), (5, 13.0, 52.2)]:
+            writer.add_node(Node(id=node_id, location=(lon, lat)))
+        # nodes of the relation's member way and the relation's member node
+        writer.add_node(Node(id=6, location=(14.0, 53.0)))
+        writer.add_node(Node(id=7, location=(14.4, 53.4)))
+        writer.add_node(Node(id=8, location=(14.2, 53.6)))
+        # not AWO
+        writer.add_node(Node(id=9, location=(10.0, 50.0), tags={"name": "Caritas Kita"}))
+
+        writer.add_way(Way(id=10, nodes=[2, 3, 4, 5, 2],
+                           tags={"building": "yes", "operator": "Arbeiterwohlfahrt Berlin"}))
+        writer.add_way(Way(id=11, nodes=[6, 7]))
+
+        writer.add_relation(Relation(id=20, members=[("w", 11, "outer"), ("n", 8, "")],
+                                     tags={"type": "multipolygon", "brand": "AWO"}))
+    finally:
+        writer.close()
+    return path
+
+
+def test_extract_awo_from_pbf(awo_pbf):
+    df = extract_awo_from_pbf(awo_pbf, "Berlin", max_workers=1)
+    rows = {(row.type, row.osm_id): row for row in df.itertuples()}
+
+    assert set(rows) == {("node", 1), ("way", 10), ("relation", 20)}
+    assert set(df["region"]) == {"Berlin"}
+    assert rows[("node", 1)].name == "AWO Kita Sonnenschein"
+    assert (rows[("node", 1)].lat, rows[("node", 1)].lon) == pytest.approx((52.52, 13.40))
+    # way and relation centers are the bbox centers of their nodes, like Overpass "out center"
+    assert (rows[("way", 10)].lat, rows[("way", 10)].lon) == pytest.approx((52.1, 13.1))
+    assert (rows[("relation", 20)].lat, rows[("relation", 20)].lon) == pytest.approx((53.3, 14.2))
@@ -0,0 +1,110 @@
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+# Normalization of facility names and addresses before fuzzy matching (moved from osm_eda.ipynb).
+# Each mapping is compiled once into a single alternation regex (longest keys first) that only
+# matches whole tokens, so "pl." does not touch "apl." or "platz". Replacements are applied before
+# punctuation is removed, so keys with dots ("str.") match at all. Single strings are memoized,
+# Series are normalized with vectorized .str methods over their unique values only.
+
+NAMES_MAPPING ={
+    "arbeiterwohlfahrt": "awo",
+    "kindertagesstätte" : "kita",
+    "eingetragener verein" : "e.v.",
+    "evangelisch": "ev.",
+    "kreisverband":"kv",
+    "ortsverein": "ov",
+    "altersheim": "altenpflegeheim",
+}
+
+ADDRESS_MAPPING ={
+    "str.": "straße",
+    "strasse": "straße",
+    "pl." : "platz",
+
+}
+
+_WORD = "a-z0-9äüöß"
+_NON_WORD_RE = re.compile(f"[^{_WORD}]+")
+# street names written together with the abbreviation ("Hauptstr." / "Hauptstrasse")
+_STREET_SUFFIX_RE = re.compile(f"(?<=[a-zäüöß])(?:str\\.|strasse)(?![{_WORD}])")
+
+
+@lru_cache(maxsize=None)
+def _compile(rules: tuple) -> re.Pattern:
+    """One regex for all keys of a mapping, matching only whole tokens."""
+    alternatives = []
+    for key, _ in sorted(rules, key=lambda rule: len(rule[0]), reverse=True):
+        pattern = f"(?<![{_WORD}]){re.escape(key)}"
+        if re.match(f"[{_WORD}]", key[-1]):
+            pattern += f"(?![{_WORD}])"
+        alternatives.append(pattern)
+    return re.compile("|".join(alternatives))
+
+
+class TextNormalizer:
+    """Lower case, mapping replacements, punctuation to spaces, collapsed whitespace.
+    Calling it normalizes one string (memoized), series() a whole pandas Series."""
+
+    def __init__(self, rules: dict, street_suffix: bool = False, cache_size: int = 2 ** 16):
+        self.rules = dict(rules)
+        self._pattern = _compile(tuple(self.rules.items())) if self.rules else None
+        self._street_suffix = street_suffix
+        self._cached = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _replace(self, match: re.Match) -> str:
+        return self.rules[match.group(0)]
+
+    def _normalize(self, text: str) -> str:
+        text = text.lower()
+        if self._street_suffix:
+            text = _STREET_SUFFIX_RE.sub("straße", text)
+        if self._pattern is not None:
+            text = self._pattern.sub(self._replace, text)
+        return _NON_WORD_RE.sub(" ", text).strip()
+
+    def __call__(self, text) -> str:
+        if not isinstance(text, str):
+            if text is None or pd.isna(text):
+                return ""
+            text = str(text)
+        return self._cached(text)
+
+    def series(self, values: pd.Series) -> pd.Series:
+        """Vectorized normalization; each distinct value is processed once, missing values become ""."""
+        uniques = values.dropna().unique()
+        text = pd.Series(uniques).astype("string").str.lower()
+        if self._street_suffix:
+            text = text.str.replace(_STREET_SUFFIX_RE, "straße", regex=True)
+        if self._pattern is not None:
+            text = text.str.replace(self._pattern, self._replace, regex=True)
+        text = text.str.replace(_NON_WORD_RE, " ", regex=True).str.strip()
+        lookup = dict(zip(uniques, text.astype(object)))
+        return values.map(lookup).fillna("").astype(object)
+
+
+name_normalizer = TextNormalizer(NAMES_MAPPING)
+address_normalizer = TextNormalizer(ADDRESS_MAPPING, street_suffix=True)
+
+
+@lru_cache(maxsize=32)
+def _normalizer_for(rules: tuple) -> TextNormalizer:
+    return TextNormalizer(dict(rules))
+
+
+def normalize_text(text:str, rules:dict) ->str:
+    return _normalizer_for(tuple(rules.items()))(text)
+
+def normalize_name(text:str) ->str:
+    return name_normalizer(text)
+
+def normalize_address(addr:str) ->str:
+    return address_normalizer(addr)
+
+def normalize_names(values: pd.Series) -> pd.Series:
+    return name_normalizer.series(values)
+
+def normalize_addresses(values: pd.Series) -> pd.Series:
+    return address_normalizer.series(values)